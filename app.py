@@ -12,9 +12,11 @@ from azure.ai.inference.models import SystemMessage, UserMessage
 from azure.core.credentials import AzureKeyCredential
 
 from config import Config
+from utils import querystats
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = Config.SECRET_KEY
+app.config["BCRYPT_LOG_ROUNDS"] = Config.BCRYPT_LOG_ROUNDS
 
 # Enable CORS for React Native frontend
 CORS(app, origins="*")
@@ -23,9 +25,13 @@ CORS(app, origins="*")
 connect(
     db=Config.DB_NAME,
     host=Config.MONGO_URI,
-    alias='default'
+    alias='default',
+    event_listeners=[querystats.LISTENER],
 )
 
+# Per-request query counts / N+1 detection
+querystats.init_app(app)
+
 # Init bcrypt
 bcrypt.init_app(app)
 
@@ -38,6 +44,9 @@ from routes.financial_routes import financial_bp
 from routes.curricular_routes import curricular_bp
 from routes.dashboard_routes import dashboard_bp
 from routes.counselor_routes import counselor_bp
+from routes.import_routes import imports_bp
+from routes.ops_routes import ops_bp
+from routes.analytics_routes import analytics_bp
 
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix="/auth")
@@ -48,6 +57,13 @@ app.register_blueprint(financial_bp, url_prefix='/api')
 app.register_blueprint(curricular_bp, url_prefix='/api')
 app.register_blueprint(dashboard_bp, url_prefix='/api')
 app.register_blueprint(counselor_bp, url_prefix='/api')
+app.register_blueprint(imports_bp, url_prefix='/api')
+app.register_blueprint(ops_bp, url_prefix='/api')
+app.register_blueprint(analytics_bp, url_prefix='/api')
+
+# Import jobs left queued/running by a worker that has since stopped will never finish
+from utils.jobs import fail_stale_jobs
+fail_stale_jobs()
 
 
 # ----------------- CHATBOT ENDPOINT -----------------
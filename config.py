@@ -7,3 +7,55 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
     MONGO_URI = os.getenv("MONGO_URI")
     DB_NAME = os.getenv("DB_NAME", "SIH")
+
+    # Rows per batch for the bulk CSV ingestion engine
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 1000))
+
+    # Background import jobs
+    IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 2))
+    IMPORT_ERROR_LIMIT = int(os.getenv("IMPORT_ERROR_LIMIT", 100))
+    IMPORT_SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR")  # defaults to the system temp dir
+    IMPORT_RESULT_TTL = int(os.getenv("IMPORT_RESULT_TTL", 7 * 24 * 3600))  # seconds
+    # Workers touch their queued/running jobs this often; jobs silent for IMPORT_STALE_AFTER are failed at startup
+    IMPORT_HEARTBEAT = float(os.getenv("IMPORT_HEARTBEAT", 30))       # seconds
+    IMPORT_STALE_AFTER = float(os.getenv("IMPORT_STALE_AFTER", 300))  # seconds
+
+    # Password hashing. BCRYPT_TARGET_MS (if set) calibrates the cost to that hash time instead
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+    BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", 0)) or None
+    AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", 2))  # signin/signup/reset pool
+    AUTH_HASH_QUEUE = int(os.getenv("AUTH_HASH_QUEUE", 32))     # in-flight jobs before 503
+    HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 1))  # bulk provisioning pool
+
+    # Authenticated principals (decoded token + User/Counselor) cached per token
+    AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 60))  # seconds
+    AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+    # Per-user principal records (role, status, counselor id) shared by the workers on a node
+    AUTH_SHARED_CACHE_PATH = os.getenv("AUTH_SHARED_CACHE_PATH")  # e.g. /dev/shm/sih-auth; unset = per process
+    AUTH_SHARED_CACHE_SLOTS = int(os.getenv("AUTH_SHARED_CACHE_SLOTS", 65536))  # 100 bytes each
+    AUTH_SHARED_CACHE_TTL = int(os.getenv("AUTH_SHARED_CACHE_TTL", 300))  # seconds
+
+    # Revoked token ids are mirrored in memory and re-synced from Mongo this often
+    REVOCATION_REFRESH = float(os.getenv("REVOCATION_REFRESH", 5))  # seconds
+
+    # Signin buffers lastLogin and flushes it in bulk
+    LOGIN_FLUSH_INTERVAL = float(os.getenv("LOGIN_FLUSH_INTERVAL", 5))  # seconds
+    LOGIN_FLUSH_MAX = int(os.getenv("LOGIN_FLUSH_MAX", 1000))           # pending users that force a flush
+    LOGIN_TOUCH_UPDATED_AT = os.getenv("LOGIN_TOUCH_UPDATED_AT", "true").lower() == "true"
+
+    # Rate limits on the credential endpoints, as "<count>/<seconds>"
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | mongo | module:Class
+    RATE_LIMIT_IP = os.getenv("RATE_LIMIT_IP", "30/60")
+    RATE_LIMIT_ACCOUNT = os.getenv("RATE_LIMIT_ACCOUNT", "5/60")
+    RATE_LIMIT_SWEEP = float(os.getenv("RATE_LIMIT_SWEEP", 60))  # seconds between evictions
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+    # Per-request Mongo command stats (utils/querystats.py)
+    QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "false").lower() == "true"  # always on in debug
+    QUERY_N_PLUS_ONE = int(os.getenv("QUERY_N_PLUS_ONE", 5))  # repeats of one query shape flagged as N+1
+
+    # API keys for machine clients, stored as HMAC-SHA256 with this secret
+    API_KEY_SECRET = os.getenv("API_KEY_SECRET", SECRET_KEY)
+    API_KEY_CACHE_TTL = int(os.getenv("API_KEY_CACHE_TTL", 60))  # seconds
+    API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", 1000))
@@ -2,6 +2,14 @@ from mongoengine import Document,ReferenceField,IntField,StringField,DictField,B
 from models.student import StudentProfile
 
 class AcademicRecord(Document):
+    meta = {
+        "indexes": [
+            {"fields": ["student", "semester"], "unique": True},
+        ],
+        # built by `python -m utils.indexes build` (after `dedupe`), not on first use
+        "auto_create_index": False,
+    }
+
     student = ReferenceField(StudentProfile,required=True)
     semester = IntField(required=True)
     gpa = FloatField()
@@ -14,7 +14,13 @@ class Alert(Document):
     """
     Model for storing student alerts based on risk factors
     """
-    meta = {"collection": "alerts"}
+    meta = {
+        "collection": "alerts",
+        "indexes": [
+            ("user", "status", "-created_at"),  # a student's inbox
+            ("student", "-created_at"),
+        ],
+    }
     
     # References
     student = ReferenceField(StudentProfile, required=True)
@@ -145,7 +151,10 @@ class RiskAssessment(Document):
     """
     Model for storing periodic risk assessments for students
     """
-    meta = {"collection": "risk_assessments"}
+    meta = {
+        "collection": "risk_assessments",
+        "indexes": [("student", "-assessment_date")],  # latest assessment first
+    }
     
     student = ReferenceField(StudentProfile, required=True)
     
@@ -0,0 +1,26 @@
+from mongoengine import Document, StringField, ListField, BooleanField, DateTimeField
+import datetime
+
+class ApiKey(Document):
+    """
+    A machine client's API key. Only its HMAC is stored; `prefix` is the
+    first characters of the key, to tell keys apart when listing them.
+    """
+    meta = {"collection": "api_keys"}
+
+    name = StringField(required=True)                 # e.g. "nightly SIS sync"
+    key_hash = StringField(required=True, unique=True)
+    prefix = StringField(required=True)
+    scopes = ListField(StringField())                 # blueprint names, or "*"
+    active = BooleanField(default=True)
+    createdAt = DateTimeField(default=datetime.datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": str(self.id),
+            "name": self.name,
+            "prefix": self.prefix,
+            "scopes": self.scopes,
+            "active": self.active,
+            "createdAt": self.createdAt.isoformat(),
+        }
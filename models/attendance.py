@@ -2,6 +2,14 @@ from mongoengine import Document,ReferenceField,IntField,FloatField,StringField
 from models.student import StudentProfile
 
 class Attendance(Document):
+    meta = {
+        "indexes": [
+            {"fields": ["student", "semester"], "unique": True},
+        ],
+        # built by `python -m utils.indexes build` (after `dedupe`), not on first use
+        "auto_create_index": False,
+    }
+
     student = ReferenceField(StudentProfile, required=True)
     semester = IntField(required=True)
     session_type = StringField(choices=['day', 'evening'])  # new if you want per-semester
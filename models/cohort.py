@@ -0,0 +1,31 @@
+from mongoengine import Document, StringField, IntField, FloatField
+
+class CohortRollup(Document):
+    """
+    Totals of one cohort: the dashboard rows of one semester for students
+    of one course, year, session type and institution type. Kept equal to
+    a $group over student_dashboards (see utils/cohort.py).
+    """
+    meta = {
+        "collection": "cohort_rollups",
+        "indexes": [
+            {"fields": ["course", "year", "semester", "session_type", "institutionType"], "unique": True},
+        ],
+    }
+
+    course = StringField()
+    year = IntField()
+    semester = IntField()
+    session_type = StringField()
+    institutionType = StringField()
+
+    students = IntField(default=0)        # dashboard rows (one per student)
+    safe = IntField(default=0)
+    warning = IntField(default=0)
+    atRisk = IntField(default=0)
+    gpaSum = FloatField(default=0)
+    gpaCount = IntField(default=0)
+    attendanceSum = FloatField(default=0)
+    attendanceCount = IntField(default=0)
+    backlogsSum = IntField(default=0)
+    withBacklogs = IntField(default=0)    # rows with at least one backlog
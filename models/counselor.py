@@ -4,6 +4,10 @@ from models.user import User
 import datetime
 
 class Counselor(Document):
+    meta = {
+        "indexes": ["assigned_students"]  # which counselor has this student
+    }
+
     user = ReferenceField(User, required=True, unique=True)   # linked user account
     specialization = StringField(required=True)               # counselor expertise
     experienceYears = IntField(default=0)                     # years of experience
@@ -16,6 +20,10 @@ class Counselor(Document):
 
 
 class CounselorNote(Document):
+    meta = {
+        "indexes": [("student", "counselor", "createdAt")]
+    }
+
     counselor = ReferenceField(Counselor, required=True)
     student = ReferenceField(StudentProfile, required=True)
     note = StringField(required=True)
@@ -0,0 +1,8 @@
+from mongoengine import Document, StringField, IntField
+
+class Counter(Document):
+    """Named sequence, advanced atomically with $inc (e.g. "userId:student")"""
+    meta = {"collection": "counters"}
+
+    name = StringField(primary_key=True)
+    value = IntField(default=0)
@@ -2,6 +2,14 @@ from mongoengine import Document, ReferenceField, IntField, FloatField
 from models.student import StudentProfile
 
 class CurricularUnit(Document):
+    meta = {
+        "indexes": [
+            {"fields": ["student", "semester"], "unique": True},
+        ],
+        # built by `python -m utils.indexes build` (after `dedupe`), not on first use
+        "auto_create_index": False,
+    }
+
     student = ReferenceField(StudentProfile, required=True)
     semester = IntField(required=True)
     enrolled_units = IntField(required=True)
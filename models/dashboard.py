@@ -0,0 +1,32 @@
+from mongoengine import Document, ObjectIdField, StringField, IntField, ListField, DictField, FloatField
+
+class StudentDashboard(Document):
+    """
+    Read model behind GET /api/dashboard/student/<user_id>: one student's
+    dashboard, semester rows and risk status included, rewritten by
+    utils.dashboard_utils.refresh_dashboards whenever the profile,
+    academic or attendance data of the student is written.
+    """
+    meta = {"collection": "student_dashboards"}
+
+    student = ObjectIdField(required=True, unique=True)   # StudentProfile id
+    user = ObjectIdField(required=True, unique=True)      # User id
+    userId = StringField(unique=True, sparse=True)
+    name = StringField()
+    course = StringField()
+    year = IntField()
+    session_type = StringField()                          # profile fields the cohort
+    institutionType = StringField()                       # rollups group by
+    semesters = ListField(DictField())                    # rows as returned by the route
+    refreshed_at = FloatField(required=True)              # epoch seconds the data was read at
+
+    def to_response(self):
+        return {
+            "student": {
+                "userId": str(self.user),   # always return Mongo _id as string
+                "name": self.name,
+                "course": self.course,
+                "year": self.year
+            },
+            "dashboard": self.semesters
+        }
@@ -0,0 +1,82 @@
+from mongoengine import (
+    Document, StringField, IntField, FloatField, ListField, DictField,
+    DateTimeField, ObjectIdField
+)
+from config import Config
+import datetime
+
+class ImportJob(Document):
+    """
+    Background import submitted by one of the upload routes
+    """
+    meta = {"collection": "import_jobs"}
+
+    job_id = StringField(required=True, unique=True)
+    entity = StringField(required=True)                 # student / academic / ... / bundle / provision
+    filename = StringField()
+    format = StringField(default="csv", choices=["csv", "parquet", "arrow"])
+    mode = StringField(default="insert", choices=["insert", "upsert"])
+    status = StringField(default="queued", choices=["queued", "running", "completed", "failed"])
+
+    # Progress, updated after every batch
+    rows_processed = IntField(default=0)
+    rows_inserted = IntField(default=0)
+    rows_updated = IntField(default=0)
+    rows_skipped = IntField(default=0)
+    rows_per_sec = FloatField()
+    parts = DictField()                                 # bundle jobs: importer name -> stats
+
+    # Error report: first IMPORT_ERROR_LIMIT skipped rows, plus a fatal error if the job crashed.
+    # The full lists live in ImportResult and are streamed by /imports/<job_id>/results
+    errors = ListField(DictField())
+    skipped_by_reason = DictField()
+    error = StringField()
+
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+    started_at = DateTimeField()
+    finished_at = DateTimeField()
+    heartbeat_at = DateTimeField(default=datetime.datetime.utcnow)  # touched while queued/running
+
+    def to_dict(self):
+        return {
+            "jobId": self.job_id,
+            "entity": self.entity,
+            "filename": self.filename,
+            "format": self.format,
+            "mode": self.mode,
+            "status": self.status,
+            "rowsProcessed": self.rows_processed,
+            "rowsInserted": self.rows_inserted,
+            "rowsUpdated": self.rows_updated,
+            "rowsSkipped": self.rows_skipped,
+            "rowsPerSec": self.rows_per_sec,
+            "parts": self.parts,
+            "errors": self.errors,
+            "skippedByReason": self.skipped_by_reason,
+            "error": self.error,
+            "createdAt": self.created_at.isoformat() if self.created_at else None,
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+            "heartbeatAt": self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+        }
+
+
+class ImportResult(Document):
+    """
+    Created ids and skipped rows of one batch of an ImportJob.
+    Expires IMPORT_RESULT_TTL seconds after the batch was written.
+    """
+    meta = {
+        "collection": "import_results",
+        "indexes": [
+            ("job_id", "seq"),
+            {"fields": ["created_at"], "expireAfterSeconds": Config.IMPORT_RESULT_TTL},
+        ],
+    }
+
+    job_id = StringField(required=True)
+    seq = IntField(required=True)
+    entity = StringField()
+    created = ListField(ObjectIdField())
+    skipped = ListField(DictField())
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
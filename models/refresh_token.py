@@ -0,0 +1,23 @@
+from mongoengine import Document, StringField, BooleanField, DateTimeField, ObjectIdField
+
+class RefreshToken(Document):
+    """
+    One refresh token, stored as a SHA-256 hash. Every rotation of a signin
+    shares its `family`; used tokens stay until they expire so a replayed
+    one can be detected.
+    """
+    meta = {
+        "collection": "refresh_tokens",
+        "indexes": [
+            {"fields": ["token_hash"], "unique": True},
+            "family",
+            "user",
+            {"fields": ["expires_at"], "expireAfterSeconds": 0},
+        ],
+    }
+
+    token_hash = StringField(required=True)
+    user = ObjectIdField(required=True)        # plain id: refreshing never dereferences
+    family = StringField(required=True)
+    used = BooleanField(default=False)
+    expires_at = DateTimeField(required=True)
@@ -0,0 +1,20 @@
+from mongoengine import Document, StringField, DateTimeField
+import datetime
+
+class RevokedToken(Document):
+    """
+    A revoked JWT, identified by its jti. Mongo drops it once the token
+    would have expired anyway.
+    """
+    meta = {
+        "collection": "revoked_tokens",
+        "indexes": [
+            {"fields": ["expires_at"], "expireAfterSeconds": 0},
+            "revoked_at",
+        ],
+    }
+
+    jti = StringField(required=True, unique=True)
+    userId = StringField()
+    expires_at = DateTimeField(required=True)
+    revoked_at = DateTimeField(default=datetime.datetime.utcnow)
@@ -0,0 +1,8 @@
+from mongoengine import Document, StringField, DynamicField
+
+class Setting(Document):
+    """Named value shared by every process (e.g. the calibrated bcrypt cost)"""
+    meta = {"collection": "settings"}
+
+    name = StringField(primary_key=True)
+    value = DynamicField()
@@ -5,6 +5,10 @@ from mongoengine import (
 import datetime
 
 class StudentProfile(Document):
+    meta = {
+        "indexes": ["assigned_counselor"]
+    }
+
     user = ReferenceField("User", required=True, unique=True)
 
     age_at_enrollment = IntField()
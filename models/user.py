@@ -2,10 +2,15 @@ from mongoengine import Document, StringField, DateTimeField
 import datetime
 
 class User(Document):
-    meta = {"collection": "users"}  # optional but explicit
+    meta = {
+        "collection": "users",
+        # unique indexes are built by `python -m utils.indexes build` (after `dedupe`), not on first use
+        "auto_create_index": False,
+    }
+    dedupe_deletes = False  # `dedupe` only reports duplicate accounts, a human merges them
     userId = StringField(required=True, unique=True)   # STU001 / CNS001 / ADM001
     name = StringField(required=True)
-    email = StringField()
+    email = StringField(unique=True, sparse=True)       # optional, but never shared
     passwordHash = StringField(required=True)          # bcrypt hash
     role = StringField(required=True, choices=["student", "counselor", "admin"])
     status = StringField(default="active")             # active | inactive
@@ -13,6 +18,19 @@ class User(Document):
     createdAt = DateTimeField(default=datetime.datetime.utcnow)
     updatedAt = DateTimeField(default=datetime.datetime.utcnow)
 
+    def clean(self):
+        if not self.email:
+            self.email = None  # stored absent: the sparse index would let only one user have ""
+
+    @classmethod
+    def prepare_indexes(cls, dry_run=False):
+        """Unset blank emails before the unique index builds. Returns how many."""
+        collection = cls._get_db()[cls._get_collection_name()]
+        blank = {"email": {"$in": ["", None], "$exists": True}}
+        if dry_run:
+            return collection.count_documents(blank)
+        return collection.update_many(blank, {"$unset": {"email": ""}}).modified_count
+
     def to_dict(self):
         return {
             "id": str(self.id),
@@ -0,0 +1,38 @@
+from flask import Blueprint, request, jsonify
+from utils.principal import require_role
+from utils.cohort import KEY, cohort_stats
+
+analytics_bp = Blueprint('analytics', __name__)
+
+INT_FIELDS = ("year", "semester")
+
+
+@analytics_bp.route('/analytics/cohort', methods=['GET'])
+@require_role("admin", user=False)
+def cohort_analytics():
+    """
+    Risk distribution, mean GPA, attendance and backlogs per cohort, from
+    the rollups. ?group_by=course,year merges cohorts down to those fields
+    (default: all of course, year, semester, session_type, institutionType);
+    any of those fields may also be given as a filter, e.g. ?course=CS.
+    `students` counts distinct students: unless semester is grouped or
+    filtered on, each student counts once, with their latest semester.
+    """
+    group_by = [f for f in request.args.get('group_by', ','.join(KEY)).split(',') if f]
+    unknown = [f for f in group_by if f not in KEY]
+    if unknown:
+        return jsonify({"message": f"group_by must be made of: {', '.join(KEY)}"}), 400
+
+    filters = {}
+    for field in KEY:
+        value = request.args.get(field)
+        if value is None:
+            continue
+        if field in INT_FIELDS:
+            try:
+                value = int(value)
+            except ValueError:
+                return jsonify({"message": f"{field} must be an integer"}), 400
+        filters[field] = value
+
+    return jsonify(cohort_stats(filters, group_by)), 200
@@ -1,38 +1,37 @@
 # routes/auth.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from models.user import User
-from extensions import bcrypt
-from utils.utils import generate_user_id, email_in_use, userId_in_use
-import datetime, os
+from utils.utils import generate_user_id, insert_user
+from utils.ingest import PARSE_ERRORS, detect_format
+from utils.jobs import submit_provision
+from utils.provision import provision_dry_run
+from utils.tokens import JWT_EXPIRY, create_jwt, encode_token, verify_token, jwks
+from utils.principal import authenticate, require_role
+from utils.passwords import (
+    MAX_PASSWORD_BYTES, PasswordHasherBusy, check_password, hash_password, needs_rehash
+)
+from utils.revocation import is_revoked, revoke
+from utils.apikeys import create_api_key, revoke_api_key
+from models.api_key import ApiKey
+from utils.sessions import (
+    issue_refresh_token, use_refresh_token, revoke_family, revoke_refresh_token, revoke_user_sessions
+)
+from utils.logins import record_login
+from utils.ratelimit import rate_limit
+import datetime, uuid
+from bson import ObjectId
 import jwt  # ✅ PyJWT
 
 auth_bp = Blueprint("auth", __name__)
 
-# Load from env or defaults
-JWT_SECRET = os.getenv("JWT_SECRET", "supersecret")
-JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-JWT_EXPIRY = int(os.getenv("JWT_EXPIRY", 3600))  # seconds
 
+def busy():
+    """503 for when the password hashing pool is saturated"""
+    return jsonify({"message": "Server is busy, please retry shortly"}), 503, {"Retry-After": "1"}
 
-def create_jwt(user):
-    """Generate JWT for a user"""
-    payload = {
-        "userId": user.userId,
-        "role": user.role,
-        "exp": datetime.datetime.utcnow() + datetime.timedelta(seconds=JWT_EXPIRY),
-        "iat": datetime.datetime.utcnow(),
-    }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-
-def decode_jwt(token):
-    """Decode and verify JWT"""
-    try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-    except jwt.ExpiredSignatureError:
-        return None  # expired
-    except jwt.InvalidTokenError:
-        return None  # invalid
+def password_too_long(password):
+    return len(password.encode("utf-8")) > MAX_PASSWORD_BYTES
 
 
 # ---------- Signup ----------
@@ -47,22 +46,24 @@ def signup():
 
     if not name or not password:
         return jsonify({"message": "name and password are required"}), 400
+    if role not in User.role.choices:
+        return jsonify({"message": f"role must be one of: {', '.join(User.role.choices)}"}), 400
+    if role != "student":
+        # staff accounts can read and change student data: an admin creates them
+        _, err_resp, _ = authenticate(("admin",), user=False)
+        if err_resp:
+            return jsonify({"message": f"Only an admin can create {role} accounts"}), 403
+    if password_too_long(password):
+        return jsonify({"message": f"password must be at most {MAX_PASSWORD_BYTES} bytes"}), 400
 
-    if userId:
-        if userId_in_use(userId):
-            return jsonify({"message": "userId already exists"}), 400
-    else:
-        userId = generate_user_id(role)
-
-    if email:
-        if email_in_use(email):
-            return jsonify({"message": "email already in use"}), 400
-
-    pw_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+    try:
+        pw_hash = hash_password(password)
+    except PasswordHasherBusy:
+        return busy()
     now = datetime.datetime.utcnow()
 
     user = User(
-        userId=userId,
+        userId=userId or generate_user_id(role),
         name=name,
         email=email,
         passwordHash=pw_hash,
@@ -71,7 +72,12 @@ def signup():
         createdAt=now,
         updatedAt=now,
     )
-    user.save()
+    # one insert; the unique indexes reject a taken userId or email
+    taken = insert_user(user, generated_id=not userId)
+    if taken == "email":
+        return jsonify({"message": "email already in use"}), 400
+    if taken:
+        return jsonify({"message": "userId already exists"}), 400
 
     # 🔥 Auto-create Counselor profile if role=counselor
     if role == "counselor":
@@ -79,10 +85,77 @@ def signup():
         if not Counselor.objects(user=user).first():
             Counselor(user=user).save()
 
-    return jsonify({"message": "user created", "userId": userId}), 201
+    return jsonify({"message": "user created", "userId": user.userId}), 201
+
+# ---------- Bulk provisioning (admin) ----------
+@auth_bp.route("/provision", methods=["POST"])
+@require_role("admin", user=False)
+def provision_students():
+    """
+    Create student accounts from a roster file (CSV, Parquet or Arrow) with
+    columns userId (optional, generated when blank), name, email, password
+    and the student profile columns. Runs as an import job; ?dry_run=true
+    only validates and checks uniqueness.
+    """
+    file = request.files.get("file")
+    if not file:
+        return jsonify({"message": "No file uploaded"}), 400
+
+    try:
+        fmt = detect_format(file.filename, file.mimetype)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 415
+
+    batch_size = request.args.get("batch_size")
+    if request.args.get("dry_run") == "true":
+        try:
+            report = provision_dry_run(file.stream, batch_size, fmt)
+        except PARSE_ERRORS as e:
+            return jsonify({"message": f"Could not read the file: {str(e).strip()}"}), 400
+        return jsonify(report), 200
+
+    job = submit_provision(file, batch_size, fmt)
+    return jsonify({"message": "Provisioning queued", "jobId": job.job_id}), 202
+
+
+# ---------- API keys (admin) ----------
+@auth_bp.route("/api-keys", methods=["POST"])
+@require_role("admin", user=False)
+def create_key():
+    """
+    Create an API key for a machine client. Body: name, scopes (blueprint
+    names such as academic, attendance, imports, or "*"). The key is only
+    returned here.
+    """
+    data = request.get_json() or {}
+    name = data.get("name")
+    scopes = data.get("scopes")
+    if not name or not scopes or not isinstance(scopes, list):
+        return jsonify({"message": "name and a list of scopes are required"}), 400
+
+    api_key, key = create_api_key(name, scopes)
+    return jsonify({**api_key.to_dict(), "key": key}), 201
+
+
+@auth_bp.route("/api-keys", methods=["GET"])
+@require_role("admin", user=False)
+def list_keys():
+    return jsonify([k.to_dict() for k in ApiKey.objects.exclude("key_hash")]), 200
+
+
+@auth_bp.route("/api-keys/<key_id>", methods=["DELETE"])
+@require_role("admin", user=False)
+def delete_key(key_id):
+    api_key = ApiKey.objects(id=key_id).first() if ObjectId.is_valid(key_id) else None
+    if not api_key:
+        return jsonify({"message": "API key not found"}), 404
+    revoke_api_key(api_key)
+    return jsonify({"message": "API key revoked"}), 200
+
 
 # ---------- Signin ----------
 @auth_bp.route("/signin", methods=["POST"])
+@rate_limit("signin")
 def signin():
     data = request.get_json() or {}
     userId = data.get("userId")
@@ -103,41 +176,72 @@ def signin():
     if not user:
         return jsonify({"message": "invalid credentials"}), 401
 
-    if not bcrypt.check_password_hash(user.passwordHash, password):
+    try:
+        valid = check_password(password, user.passwordHash)
+    except PasswordHasherBusy:
+        return busy()
+    if not valid:
         return jsonify({"message": "invalid credentials"}), 401
 
-    # update lastLogin and updatedAt
-    user.lastLogin = datetime.datetime.utcnow()
-    user.updatedAt = datetime.datetime.utcnow()
-    user.save()
+    # upgrade hashes made with a lower cost factor
+    if needs_rehash(user.passwordHash):
+        try:
+            user.passwordHash = hash_password(password)
+            user.save()
+        except PasswordHasherBusy:
+            pass  # try again on a later login
+
+    # lastLogin (and updatedAt) are buffered and written in bulk
+    record_login(user.id)
 
-    # Generate JWT
+    # Short-lived access token plus a refresh token for /auth/refresh
     token = create_jwt(user)
 
     return jsonify({
         "message": f"Welcome {user.name}",
         "user": {"userId": user.userId, "name": user.name, "role": user.role},
-        "token": token
+        "token": token,
+        "expiresIn": JWT_EXPIRY,
+        "refreshToken": issue_refresh_token(user.id),
+    }), 200
+
+
+# ---------- Refresh ----------
+@auth_bp.route("/refresh", methods=["POST"])
+@rate_limit("refresh", per_account=False)
+def refresh():
+    """
+    Trade a refresh token for a new access token and a new refresh token.
+    Each refresh token works once; replaying one logs its whole signin out.
+    """
+    data = request.get_json() or {}
+    refresh_token = data.get("refreshToken")
+    if not refresh_token:
+        return jsonify({"message": "refreshToken is required"}), 400
+
+    session = use_refresh_token(refresh_token)
+    if not session:
+        return jsonify({"message": "Invalid or expired refresh token"}), 401
+
+    # re-read role and status so the new access token reflects any change
+    user = User.objects(id=session.user).first()
+    if not user or user.status != "active":
+        revoke_family(session.family)
+        return jsonify({"message": "Invalid or expired refresh token"}), 401
+
+    return jsonify({
+        "token": create_jwt(user),
+        "expiresIn": JWT_EXPIRY,
+        "refreshToken": issue_refresh_token(user.id, family=session.family),
     }), 200
 
 
 # ---------- Protected route example ----------
 @auth_bp.route("/profile", methods=["GET"])
+@require_role()
 def profile():
     """Example protected route"""
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"message": "Missing or invalid token"}), 401
-
-    token = auth_header.split(" ")[1]
-    decoded = decode_jwt(token)
-    if not decoded:
-        return jsonify({"message": "Token is invalid or expired"}), 401
-
-    user = User.objects(userId=decoded["userId"]).first()
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-
+    user = g.user
     return jsonify({
         "userId": user.userId,
         "name": user.name,
@@ -145,18 +249,34 @@ def profile():
     }), 200
 
 
+# ---------- Public keys ----------
+@auth_bp.route("/.well-known/jwks.json", methods=["GET"])
+def get_jwks():
+    """Public keys (JWKS) for verifying our tokens without calling back"""
+    resp = jsonify(jwks())
+    resp.headers["Cache-Control"] = "public, max-age=300"
+    return resp, 200
+
+
 # ---------- Logout ----------
 @auth_bp.route("/logout", methods=["POST"])
+@require_role(user=False)
 def logout():
     """
-    With JWT, logout is usually handled client-side (just delete the token).
-    Optionally, maintain a token blacklist for server-side invalidation.
+    Revokes the presented token server-side (see utils/revocation.py), and
+    the refresh token in the body if one is given. Clients should still
+    delete both.
     """
+    revoke(g.claims)
+    refresh_token = (request.get_json(silent=True) or {}).get("refreshToken")
+    if refresh_token:
+        revoke_refresh_token(refresh_token)
     return jsonify({"message": "You have been logged out successfully"}), 200
 
 
 # ---------- Forgot Password ----------
 @auth_bp.route("/forgot-password", methods=["POST"])
+@rate_limit("forgot-password")
 def forgot_password():
     data = request.get_json() or {}
     email = data.get("email")
@@ -169,14 +289,14 @@ def forgot_password():
         return jsonify({"message": "User not found"}), 404
 
     # Create a short-lived reset token (15 min)
-    reset_token = jwt.encode(
+    reset_token = encode_token(
         {
+            "typ": "reset",
             "userId": user.userId,
             "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=15),
-            "iat": datetime.datetime.utcnow()
-        },
-        JWT_SECRET,
-        algorithm=JWT_ALGORITHM
+            "iat": datetime.datetime.utcnow(),
+            "jti": uuid.uuid4().hex,  # single use, revoked once the password is reset
+        }
     )
 
     # Normally you would email this to the user
@@ -188,6 +308,7 @@ def forgot_password():
 
 # ---------- Reset Password ----------
 @auth_bp.route("/reset-password", methods=["POST"])
+@rate_limit("reset-password", per_account=False)
 def reset_password():
     data = request.get_json() or {}
     reset_token = data.get("token")
@@ -195,22 +316,32 @@ def reset_password():
 
     if not reset_token or not new_password:
         return jsonify({"message": "token and newPassword are required"}), 400
+    if password_too_long(new_password):
+        return jsonify({"message": f"newPassword must be at most {MAX_PASSWORD_BYTES} bytes"}), 400
 
     try:
-        decoded = jwt.decode(reset_token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        decoded = verify_token(reset_token)
     except jwt.ExpiredSignatureError:
         return jsonify({"message": "Reset token expired"}), 400
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid reset token"}), 400
+    if decoded.get("typ") != "reset":
+        return jsonify({"message": "Invalid reset token"}), 400
+    if is_revoked(decoded.get("jti")):
+        return jsonify({"message": "Reset token already used"}), 400
 
     user = User.objects(userId=decoded["userId"], status="active").first()
     if not user:
         return jsonify({"message": "User not found"}), 404
 
     # Hash new password
-    pw_hash = bcrypt.generate_password_hash(new_password).decode("utf-8")
-    user.passwordHash = pw_hash
+    try:
+        user.passwordHash = hash_password(new_password)
+    except PasswordHasherBusy:
+        return busy()
     user.updatedAt = datetime.datetime.utcnow()
     user.save()
+    revoke(decoded)
+    revoke_user_sessions(user.id)  # sign out every device
 
     return jsonify({"message": "Password has been reset successfully"}), 200
\ No newline at end of file
@@ -1,53 +1,19 @@
 # routes/counselor_routes.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from models.counselor import Counselor, CounselorNote
 from models.student import StudentProfile
 from models.user import User
-from routes.auth import decode_jwt  # JWT utility function
+from utils.principal import require_role
 import datetime
 
 counselor_bp = Blueprint("counselor", __name__)
 
 
-# ---------- Helper ----------
-def get_current_counselor():
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return None, jsonify({"message": "Missing or invalid token"}), 401
-
-    token = auth_header.split(" ")[1]
-    decoded = decode_jwt(token)
-    if not decoded or decoded["role"] != "counselor":
-        return None, jsonify({"message": "Unauthorized"}), 403
-
-    # fetch the user first
-    user = User.objects(userId=decoded["userId"]).first()
-    if not user:
-        return None, jsonify({"message": "User not found"}), 404
-
-    counselor = Counselor.objects(user=user).first()
-    if not counselor:
-        return None, jsonify({"message": "Counselor profile not found"}), 404
-
-    return counselor, None, None
-
-
 @counselor_bp.route("/counselor/create-profile", methods=["POST"])
+@require_role("counselor")
 def create_counselor_profile():
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"message": "Missing or invalid token"}), 401
-
-    token = auth_header.split(" ")[1]
-    decoded = decode_jwt(token)
-    if not decoded or decoded["role"] != "counselor":
-        return jsonify({"message": "Unauthorized"}), 403
-
-    user = User.objects(userId=decoded["userId"]).first()
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-
+    user = g.user
     if Counselor.objects(user=user).first():
         return jsonify({"message": "Counselor profile already exists"}), 400
 
@@ -96,10 +62,9 @@ def create_counselor_profile():
 
 # ---------- Update Counselor Profile ----------
 @counselor_bp.route("/counselor/update-profile", methods=["PUT"])
+@require_role("counselor", counselor=True, user=False)
 def update_counselor_profile():
-    counselor, err_resp, code = get_current_counselor()
-    if err_resp:
-        return err_resp, code
+    counselor = g.counselor
 
     data = request.get_json() or {}
 
@@ -132,10 +97,9 @@ def update_counselor_profile():
 
 # ---------- Assign Multiple Students ----------
 @counselor_bp.route("/counselor/students/assign", methods=["POST"])
+@require_role("counselor", counselor=True, user=False)
 def assign_multiple_students():
-    counselor, err_resp, code = get_current_counselor()
-    if err_resp:
-        return err_resp, code
+    counselor = g.counselor
 
     data = request.get_json() or {}
     student_ids = data.get("studentIds", [])
@@ -179,27 +143,29 @@ def assign_multiple_students():
 
 # ---------- Get Assigned Students ----------
 @counselor_bp.route("/counselor/students", methods=["GET"])
+@require_role("counselor", counselor=True, user=False)
 def get_assigned_students():
-    counselor, err_resp, code = get_current_counselor()
-    if err_resp:
-        return err_resp, code
+    counselor = g.counselor
 
+    # one query for all the users rather than dereferencing s.user per student
+    profiles = counselor.assigned_students
+    user_ids = [s.to_mongo()["user"] for s in profiles]
+    users = User.objects.only("userId", "name").in_bulk(user_ids)
     students = [
         {
-            "studentId": s.user.userId,
-            "name": s.user.name,
+            "studentId": users[uid].userId,
+            "name": users[uid].name,
             "semester": s.semester
-        } for s in counselor.assigned_students
+        } for s, uid in zip(profiles, user_ids) if uid in users
     ]
     return jsonify({"students": students}), 200
 
 
 # ---------- Get Single Student Details ----------
 @counselor_bp.route("/counselor/students/<student_id>", methods=["GET"])
+@require_role("counselor", counselor=True, user=False)
 def get_student_details(student_id):
-    counselor, err_resp, code = get_current_counselor()
-    if err_resp:
-        return err_resp, code
+    counselor = g.counselor
 
     student_user = User.objects(userId=student_id).first()
     if not student_user:
@@ -225,10 +191,9 @@ def get_student_details(student_id):
 
 # ---------- Add Note ----------
 @counselor_bp.route("/counselor/students/<student_id>/notes", methods=["POST"])
+@require_role("counselor", counselor=True, user=False)
 def add_note(student_id):
-    counselor, err_resp, code = get_current_counselor()
-    if err_resp:
-        return err_resp, code
+    counselor = g.counselor
 
     student_user = User.objects(userId=student_id).first()
     if not student_user:
@@ -254,10 +219,9 @@ def add_note(student_id):
 
 # ---------- Get Notes ----------
 @counselor_bp.route("/counselor/students/<student_id>/notes", methods=["GET"])
+@require_role("counselor", counselor=True, user=False)
 def get_notes(student_id):
-    counselor, err_resp, code = get_current_counselor()
-    if err_resp:
-        return err_resp, code
+    counselor = g.counselor
 
     student_user = User.objects(userId=student_id).first()
     if not student_user:
@@ -1,69 +1,42 @@
 # routes/dashboard.py
-from flask import Blueprint, jsonify
-from models.student import StudentProfile
-from models.academic import AcademicRecord
-from models.attendance import Attendance
-from utils.dashboard_utils import calculate_risk_status
-from models.user import User
+import time
+
 from bson import ObjectId
+from flask import Blueprint, current_app, jsonify
+from utils.dashboard_utils import dashboard_pipeline, dashboard_document, store_dashboards
+from models.dashboard import StudentDashboard
+from models.user import User
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/dashboard/student/<user_id>', methods=['GET'])
 def get_dashboard_data(user_id):
-    # Try fetching user by _id first
-    user = None
-    try:
-        user = User.objects(id=ObjectId(user_id)).first()
-    except Exception:
-        # If ObjectId conversion fails, ignore
-        pass
-
-    # If not found by _id, try userId field
-    if not user:
-        user = User.objects(userId=user_id).first()
-
-    if not user:
+    # user_id may be the Mongo _id or the userId; dashboards are kept up to
+    # date on write, so this is one indexed read
+    query = {"userId": user_id}
+    if ObjectId.is_valid(user_id):
+        query = {"$or": [{"user": ObjectId(user_id)}, query]}
+    dashboards = list(StudentDashboard.objects(__raw__=query).limit(2))
+    if dashboards:
+        # the ObjectId wins if both match
+        dashboard = next((d for d in dashboards if str(d.user) == user_id), dashboards[0])
+        return jsonify(dashboard.to_response()), 200
+
+    # not materialized yet (written before the read model existed)
+    refreshed_at = time.time()
+    found = next(iter(User.objects.aggregate(dashboard_pipeline(user_id))), None)
+
+    if not found:
         return jsonify({"message": "User not found"}), 404
 
-    # Fetch StudentProfile
-    profile = StudentProfile.objects(user=user).first()
+    profile = found.get("profile")
     if not profile:
         return jsonify({"message": "Student not found"}), 404
 
-    # Fetch academic and attendance records
-    academic_records = AcademicRecord.objects(student=profile).order_by('semester')
-    attendance_records = Attendance.objects(student=profile).order_by('semester')
-
-    # Map attendance by semester
-    attendance_map = {att.semester: att for att in attendance_records}
-
-    dashboard = []
-    for record in academic_records:
-        att = attendance_map.get(record.semester, None)
-        attendancePercentage = att.attendancePercentage if att else None
-        absenteeDays = att.absenteeDays if att else None
-
-        dashboard.append({
-            "semester": record.semester,
-            "gpa": record.gpa,
-            "cgpa": getattr(record, "cgpa", None),
-            "backlogs": record.backlogs,
-            "attendancePercentage": attendancePercentage,
-            "absenteeDays": absenteeDays,
-            "riskStatus": calculate_risk_status(
-                record.gpa,
-                attendancePercentage if attendancePercentage is not None else 100,
-                record.backlogs
-            )
-        })
-
-    return jsonify({
-        "student": {
-            "userId": str(user.id),   # always return Mongo _id as string
-            "name": profile.user.name,
-            "course": profile.course,
-            "year": profile.year
-        },
-        "dashboard": dashboard
-    }), 200
\ No newline at end of file
+    doc = dashboard_document(found, profile, found.get("semesters", []), refreshed_at)
+    try:
+        store_dashboards([doc])
+    except Exception:
+        # the dashboard is still served; the next read tries again
+        current_app.logger.exception("Could not store the dashboard of %s", user_id)
+    return jsonify(StudentDashboard._from_son(doc).to_response()), 200
@@ -0,0 +1,103 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from models.import_job import ImportJob, ImportResult
+from models.user import User
+from utils.bundle import BUNDLE_FILES, zip_members
+from utils.ingest import PARSE_ERRORS
+from utils.jobs import bundle_dry_run, submit_bundle
+from utils.apikeys import require_api_key_or_role
+import json, zipfile
+
+imports_bp = Blueprint('imports', __name__)
+
+
+@imports_bp.route('/imports/bundle', methods=['POST'])
+@require_api_key_or_role("admin", "counselor")
+def upload_bundle():
+    """
+    Import a whole term at once. Send either a zip archive as `file`, or the
+    CSVs as separate fields named students, financial, academic, attendance
+    and curricular. Profiles are imported first, the rest concurrently.
+    ?dry_run=true validates every part inline without writing.
+    """
+    archive = request.files.get('file')
+    parts = {stem: request.files[stem] for stem in BUNDLE_FILES if stem in request.files}
+    if not archive and not parts:
+        return jsonify({"message": "No file uploaded"}), 400
+
+    if archive:
+        try:
+            with zipfile.ZipFile(archive.stream) as zf:
+                found = zip_members(zf)
+        except zipfile.BadZipFile:
+            return jsonify({"message": "file must be a zip archive"}), 400
+        if not found:
+            return jsonify({
+                "message": "archive contains none of: " + ", ".join(f"{stem}.csv" for stem in BUNDLE_FILES)
+            }), 400
+        archive.stream.seek(0)
+
+    mode = request.args.get('mode', 'insert')
+    if mode not in ('insert', 'upsert'):
+        return jsonify({"message": "mode must be 'insert' or 'upsert'"}), 400
+
+    if request.args.get('dry_run') == 'true':
+        try:
+            report = bundle_dry_run(archive, parts, request.args.get('batch_size'), mode)
+        except PARSE_ERRORS as e:
+            return jsonify({"message": f"Could not read the file: {str(e).strip()}"}), 400
+        return jsonify(report), 200
+
+    job = submit_bundle(archive, parts, request.args.get('batch_size'), mode)
+
+    return jsonify({
+        "message": "Bundle import queued",
+        "jobId": job.job_id
+    }), 202
+
+
+@imports_bp.route('/imports/<job_id>', methods=['GET'])
+@require_api_key_or_role("admin", "counselor")
+def get_import_job(job_id):
+    job = ImportJob.objects(job_id=job_id).first()
+    if not job:
+        return jsonify({"message": "Import job not found"}), 404
+
+    return jsonify(job.to_dict()), 200
+
+
+
+def _accounts(user_ids):
+    """userId and email of provisioned accounts, so callers learn the generated ids"""
+    users = User.objects(id__in=user_ids).only('userId', 'email').as_pymongo()
+    return {u["_id"]: {"userId": u["userId"], "email": u.get("email")} for u in users}
+
+
+@imports_bp.route('/imports/<job_id>/results', methods=['GET'])
+@require_api_key_or_role("admin", "counselor")
+def stream_import_results(job_id):
+    """
+    Full outcome of a job as NDJSON, one line per created id or skipped row.
+    Pass ?type=created or ?type=skipped to get only one kind.
+    """
+    job = ImportJob.objects(job_id=job_id).only('entity').first()
+    if not job:
+        return jsonify({"message": "Import job not found"}), 404
+
+    kind = request.args.get('type')
+    if kind not in (None, 'created', 'skipped'):
+        return jsonify({"message": "type must be 'created' or 'skipped'"}), 400
+
+    fields = ['entity'] + ([kind] if kind else ['created', 'skipped'])
+    batches = ImportResult.objects(job_id=job_id).order_by('seq').only(*fields).as_pymongo()
+
+    def generate():
+        for batch in batches:
+            extra = {"entity": batch["entity"]} if batch.get("entity") else {}
+            created = batch.get("created", [])
+            accounts = _accounts(created) if created and job.entity == "provision" else {}
+            for _id in created:
+                yield json.dumps({"type": "created", "id": str(_id), **accounts.get(_id, {}), **extra}) + "\n"
+            for skipped in batch.get("skipped", []):
+                yield json.dumps({"type": "skipped", **skipped, **extra}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -0,0 +1,18 @@
+from flask import Blueprint, request, jsonify
+from utils.principal import require_role
+from utils import querystats
+
+ops_bp = Blueprint('ops', __name__)
+
+
+@ops_bp.route('/ops/queries', methods=['GET'])
+@require_role("admin", user=False)
+def query_stats():
+    """
+    Mongo commands per endpoint in this worker since it started (or the
+    last ?reset=true): requests, queries, DB time and N+1 query shapes.
+    """
+    stats = querystats.snapshot()
+    if request.args.get('reset') == 'true':
+        querystats.reset()
+    return jsonify(stats), 200
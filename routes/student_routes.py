@@ -1,15 +1,19 @@
 from flask import Blueprint, request, jsonify
 from models.student import StudentProfile
 from models.user import User
-import csv, io
+from utils.importers import IMPORTERS
+from utils.jobs import handle_upload
+from utils.apikeys import require_api_key_or_role
+from utils.dashboard_utils import refresh_dashboards_after_write
 
 student_bp = Blueprint('student', __name__)
 
 
 @student_bp.route('/student/profile/csv', methods=['POST'])
+@require_api_key_or_role("admin", "counselor")
 def upload_student_csv():
     """
-    Upload a CSV with columns:
+    Upload a CSV (or Parquet / Arrow IPC file) with columns:
     userId,age,gender,incomeLevel,parentOccupation,firstGenStudent,
     background,course,year,semester,institutionType,special_needs,session_type
     """
@@ -17,43 +21,7 @@ def upload_student_csv():
     if not file:
         return jsonify({"message": "No file uploaded"}), 400
 
-    reader = csv.DictReader(io.StringIO(file.stream.read().decode('UTF-8')))
-    created_profiles = []
-    skipped = []
-
-    for idx, row in enumerate(reader, start=1):
-        user = User.objects(userId=row.get('userId')).first()
-        if not user:
-            skipped.append({"row": idx, "reason": "User not found", "userId": row.get('userId')})
-            continue
-
-        try:
-            profile = StudentProfile(
-                user=user,
-                age_at_enrollment=int(row.get('age', 0)),
-                gender=row.get('gender'),
-                socioEconomicBackground={
-                    "incomeLevel": row.get("incomeLevel"),
-                    "parentOccupation": row.get('parentOccupation'),
-                },
-                firstGenStudent=row.get('firstGenStudent', 'False').lower() == 'true',
-                background=row.get('background'),
-                course=row.get('course'),
-                year=int(row.get('year', 1)),
-                semester=int(row.get('semester', 1)),
-                institutionType=row.get('institutionType', 'public'),
-                special_needs=row.get('special_needs', 'False').lower() == 'true',
-                session_type=row.get('session_type')
-            ).save()
-            created_profiles.append(str(profile.id))
-        except Exception as e:
-            skipped.append({"row": idx, "reason": str(e), "userId": row.get('userId')})
-
-    return jsonify({
-        'message': "Students uploaded",
-        'profiles': created_profiles,
-        'skipped': skipped
-    }), 201
+    return handle_upload(file, IMPORTERS['student'], "Student")
 
 
 @student_bp.route('/student/profile/<user_id>', methods=['PATCH'])
@@ -77,6 +45,7 @@ def update_student_profile(user_id):
             setattr(profile, field, data[field])
 
     profile.save()
+    refresh_dashboards_after_write([profile.id])
     return jsonify({"message": "Profile updated", "id": str(profile.id)}), 200
 
 
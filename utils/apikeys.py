@@ -0,0 +1,84 @@
+# utils/apikeys.py
+"""
+API keys for machine clients (e.g. the nightly SIS sync).
+
+A key is sent as `X-API-Key: <key>` and is scoped to blueprints
+("academic", "attendance", ... or "*"). Keys are random 256-bit strings,
+so a keyed HMAC-SHA256 (API_KEY_SECRET) is enough to store them; checking
+one costs a hash and, after the first request, a dict lookup in an
+in-process cache of hash -> key (API_KEY_CACHE_TTL, unknown keys
+included). A revoked key stops working on other workers once their entry
+expires.
+"""
+import functools
+import hashlib
+import hmac
+import secrets
+
+from flask import request, jsonify, g
+
+from config import Config
+from models.api_key import ApiKey
+from utils.cache import TTLCache
+from utils.principal import require_role
+
+KEY_PREFIX = "sk_"
+
+_cache = TTLCache(Config.API_KEY_CACHE_SIZE, Config.API_KEY_CACHE_TTL)
+
+
+def hash_api_key(key):
+    return hmac.new(Config.API_KEY_SECRET.encode("utf-8"), key.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def create_api_key(name, scopes):
+    """Store a new key. Returns (ApiKey, plaintext key); the plaintext is not kept."""
+    key = KEY_PREFIX + secrets.token_urlsafe(32)
+    api_key = ApiKey(name=name, key_hash=hash_api_key(key), prefix=key[:10], scopes=scopes).save()
+    return api_key, key
+
+
+def revoke_api_key(api_key):
+    api_key.active = False
+    api_key.save()
+    _cache.pop(api_key.key_hash)
+
+
+def lookup_api_key(key):
+    """{"id", "name", "scopes"} of an active key, or None"""
+    key_hash = hash_api_key(key)
+    entry = _cache.get(key_hash)
+    if entry is None:
+        found = ApiKey.objects(key_hash=key_hash, active=True).only("name", "scopes").first()
+        entry = {"id": str(found.id), "name": found.name, "scopes": found.scopes} if found else False
+        _cache.set(key_hash, entry)
+    return entry or None
+
+
+def require_api_key_or_role(*roles):
+    """
+    Decorator for routes machine clients call. An X-API-Key header must
+    name an active key scoped to this blueprint (g.api_key is set, g.user
+    is None); without one the request needs a bearer token with one of
+    `roles`, as with require_role.
+    """
+    def decorator(view):
+        with_token = require_role(*roles, user=False)(view)
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get("X-API-Key")
+            if not key:
+                g.api_key = None
+                return with_token(*args, **kwargs)
+
+            api_key = lookup_api_key(key)
+            if not api_key:
+                return jsonify({"message": "Invalid API key"}), 401
+            if request.blueprint not in api_key["scopes"] and "*" not in api_key["scopes"]:
+                return jsonify({"message": "API key not valid for this resource"}), 403
+            g.api_key = api_key
+            g.claims = g.user = g.counselor = None
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,79 @@
+# utils/bundle.py
+"""
+Single-archive import of a whole term: students, financial, academic,
+attendance and curricular CSVs ingested in dependency order.
+
+Profiles are written first, then the four record types run concurrently.
+All parts share one SharedResolver, so each userId is resolved once.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.importers import IMPORTERS
+from utils.ingest import SharedResolver, run_import
+
+# file stem -> importer name, in dependency order
+BUNDLE_FILES = {
+    "students": "student",
+    "financial": "financial",
+    "academic": "academic",
+    "attendance": "attendance",
+    "curricular": "curricular",
+}
+
+
+def zip_members(zf):
+    """Map importer name -> member name for the recognised CSVs in a ZipFile"""
+    members = {}
+    for name in zf.namelist():
+        stem, ext = os.path.splitext(os.path.basename(name))
+        if ext.lower() == ".csv" and stem.lower() in BUNDLE_FILES:
+            members[BUNDLE_FILES[stem.lower()]] = name
+    return members
+
+
+def _run_part(entity, open_source, resolver, batch_size, mode, progress, sink, dry_run=False):
+    importer = IMPORTERS[entity]
+    part_mode = mode if mode in importer.modes else "insert"
+    part_progress = (lambda stats: progress(entity, stats)) if progress else None
+    part_sink = (lambda created, skipped: sink(created, skipped, entity=entity)) if sink else None
+
+    with open_source() as stream:
+        return run_import(stream, importer, batch_size, progress=part_progress,
+                          mode=part_mode, resolver=resolver, sink=part_sink, dry_run=dry_run)
+
+
+def run_bundle(sources, batch_size=None, mode="insert", progress=None, sink=None, dry_run=False):
+    """
+    `sources` maps importer name -> zero-arg callable returning a binary
+    stream. `mode` applies to the parts that support it. `progress(entity,
+    stats)` is called after every batch of every part, and `sink(created,
+    skipped, entity=...)` receives each batch's outcome.
+
+    With `dry_run` nothing is written; rows of the other parts count as
+    having a profile when the students part would create it.
+
+    Returns importer name -> run_import result.
+    """
+    resolver = SharedResolver()
+    results = {}
+
+    # users -> profiles
+    if "student" in sources:
+        results["student"] = _run_part("student", sources["student"], resolver, batch_size, mode, progress, sink,
+                                     dry_run)
+    resolver.warm_profiles()
+
+    # everything else only depends on profiles
+    rest = [entity for entity in BUNDLE_FILES.values() if entity != "student" and entity in sources]
+    if rest:
+        with ThreadPoolExecutor(max_workers=len(rest), thread_name_prefix="bundle") as pool:
+            futures = {
+                entity: pool.submit(_run_part, entity, sources[entity], resolver, batch_size, mode, progress, sink,
+                                    dry_run)
+                for entity in rest
+            }
+            for entity, future in futures.items():
+                results[entity] = future.result()
+
+    return results
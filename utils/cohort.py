@@ -0,0 +1,214 @@
+# utils/cohort.py
+"""
+Institution-wide cohort rollups behind GET /api/analytics/cohort.
+
+A cohort is (course, year, semester, session_type, institutionType); its
+CohortRollup holds counts and sums over the stored dashboard rows of that
+semester for the students of that profile group, so means and the risk
+distribution come from a few small documents however many students there
+are. A student has one row per semester, so each profile group also has a
+rollup with semester None that counts every student once, by their latest
+semester's row; views not split or filtered by semester read those, and
+`students` is always a count of distinct students.
+
+The rollups are kept equal to a $group over student_dashboards:
+store_dashboards passes every dashboard it replaces, old and new, to
+`apply_changes`, which $inc's the difference into the affected cohorts
+with one bulk write. Incremental updates can't repair totals that were
+never right (dashboards written before this existed, a crash between the
+two writes), so rebuild them with
+
+    python -m utils.cohort rebuild [--dashboards]
+
+which recomputes every rollup server-side with $group and swaps the
+collection in with $out (the latest-semester rollups are added right
+after). --dashboards first re-materializes every
+student's dashboard. Increments landing while $out runs are lost, so
+rebuild while no imports are running.
+"""
+import argparse
+import collections
+import sys
+
+from pymongo import UpdateOne
+
+from models.cohort import CohortRollup
+from models.dashboard import StudentDashboard
+
+KEY = ("course", "year", "semester", "session_type", "institutionType")
+PROFILE_KEY = ("course", "year", "session_type", "institutionType")  # as stored on the dashboard
+TOTALS = ("students", "safe", "warning", "atRisk", "gpaSum", "gpaCount",
+          "attendanceSum", "attendanceCount", "backlogsSum", "withBacklogs")
+RISK_FIELDS = {"Safe": "safe", "Warning": "warning", "At Risk": "atRisk"}
+
+
+def _row_totals(row):
+    totals = {"students": 1, RISK_FIELDS[row["riskStatus"]]: 1}
+    if row.get("gpa") is not None:
+        totals.update(gpaSum=row["gpa"], gpaCount=1)
+    if row.get("attendancePercentage") is not None:
+        totals.update(attendanceSum=row["attendancePercentage"], attendanceCount=1)
+    if row.get("backlogs") is not None:
+        totals.update(backlogsSum=row["backlogs"], withBacklogs=int(row["backlogs"] > 0))
+    return totals
+
+
+def contributions(dashboard):
+    """{cohort key: totals} a stored dashboard adds to the rollups"""
+    found = collections.defaultdict(collections.Counter)
+    course, year, session_type, institution = (dashboard.get(k) for k in PROFILE_KEY)
+    rows = dashboard.get("semesters", [])
+    for row in rows:
+        found[(course, year, row["semester"], session_type, institution)].update(_row_totals(row))
+    if rows:  # rows are sorted by semester
+        found[(course, year, None, session_type, institution)].update(_row_totals(rows[-1]))
+    return found
+
+
+def apply_changes(changes):
+    """
+    Fold replaced dashboards into the rollups. `changes` is a list of
+    (old, new) stored dashboards, either side None when absent.
+    """
+    delta = collections.defaultdict(collections.Counter)
+    for old, new in changes:
+        for key, totals in (contributions(new) if new else {}).items():
+            delta[key].update(totals)
+        for key, totals in (contributions(old) if old else {}).items():
+            delta[key].subtract(totals)
+
+    ops = []
+    for key, totals in delta.items():
+        inc = {field: value for field, value in totals.items() if value}
+        if inc:
+            ops.append(UpdateOne(dict(zip(KEY, key)), {"$inc": inc}, upsert=True))
+    if ops:
+        CohortRollup._get_collection().bulk_write(ops, ordered=False)
+
+
+def _count_if(condition):
+    return {"$sum": {"$cond": [condition, 1, 0]}}
+
+
+def _rollup_stages(row, semester):
+    """$group of the dashboard rows at `row` into CohortRollup documents"""
+    return [
+        {"$group": {
+            "_id": {**{k: f"${k}" for k in PROFILE_KEY}, "semester": semester},
+            "students": {"$sum": 1},
+            **{field: _count_if({"$eq": [f"{row}.riskStatus", status]}) for status, field in RISK_FIELDS.items()},
+            "gpaSum": {"$sum": f"{row}.gpa"},
+            "gpaCount": _count_if({"$ne": [f"{row}.gpa", None]}),
+            "attendanceSum": {"$sum": f"{row}.attendancePercentage"},
+            "attendanceCount": _count_if({"$ne": [f"{row}.attendancePercentage", None]}),
+            "backlogsSum": {"$sum": f"{row}.backlogs"},
+            "withBacklogs": _count_if({"$gt": [f"{row}.backlogs", 0]}),
+        }},
+        {"$project": {"_id": 0, **{k: f"$_id.{k}" for k in KEY}, **{field: 1 for field in TOTALS}}},
+    ]
+
+
+def semester_pipeline():
+    """Per-semester rollups from every dashboard row, written over the collection with $out"""
+    return [
+        {"$unwind": "$semesters"},
+        *_rollup_stages("$semesters", "$semesters.semester"),
+        {"$out": CohortRollup._get_collection_name()},
+    ]
+
+
+def latest_pipeline():
+    """Rollups with semester None, from each dashboard's latest row"""
+    return [
+        {"$match": {"semesters.0": {"$exists": True}}},
+        {"$project": {**{k: 1 for k in PROFILE_KEY}, "latest": {"$arrayElemAt": ["$semesters", -1]}}},
+        *_rollup_stages("$latest", None),
+    ]
+
+
+def rebuild():
+    """Recompute every rollup from the stored dashboards"""
+    dashboards = StudentDashboard._get_collection()
+    # $out keeps the indexes of an existing collection but creates a missing one bare,
+    # and concurrent $inc upserts need the unique cohort index
+    CohortRollup.ensure_indexes()
+    # one document per profile group, so it is held here while $out swaps the collection
+    latest = list(dashboards.aggregate(latest_pipeline(), allowDiskUse=True))
+    list(dashboards.aggregate(semester_pipeline(), allowDiskUse=True))
+    if latest:
+        CohortRollup._get_collection().insert_many(latest)
+    return CohortRollup.objects.count()
+
+
+def _summary(totals):
+    students = totals["students"]
+    return {
+        "students": students,
+        "riskDistribution": {status: totals[field] for status, field in RISK_FIELDS.items()},
+        "meanGpa": round(totals["gpaSum"] / totals["gpaCount"], 2) if totals["gpaCount"] else None,
+        "meanAttendance": (round(totals["attendanceSum"] / totals["attendanceCount"], 2)
+                           if totals["attendanceCount"] else None),
+        "meanBacklogs": round(totals["backlogsSum"] / students, 2) if students else None,
+        "withBacklogs": totals["withBacklogs"],
+    }
+
+
+def _sort_key(key):
+    return tuple((value is None, value) for value in key)
+
+
+def _totals(filters, group_by=()):
+    """{group key: totals} of the non-empty rollups matching `filters`"""
+    groups = collections.defaultdict(collections.Counter)
+    for rollup in CohortRollup.objects(students__gt=0, **filters).exclude("id").as_pymongo():
+        groups[tuple(rollup.get(k) for k in group_by)].update({field: rollup.get(field, 0) for field in TOTALS})
+    return groups
+
+
+def cohort_stats(filters=None, group_by=KEY):
+    """
+    Cohorts matching `filters` ({key field: value}), merged down to the
+    `group_by` fields: {"groupBy", "cohorts": [{group fields, students,
+    riskDistribution, meanGpa, meanAttendance, meanBacklogs,
+    withBacklogs}], "overall"}. Unless semester is filtered on, each
+    student counts once in "overall", and once per cohort unless semester
+    is grouped on, by their latest semester.
+    """
+    filters = dict(filters or {})
+    latest = filters if "semester" in filters else {**filters, "semester": None}
+    if "semester" in group_by and "semester" not in filters:
+        groups = _totals({**filters, "semester__ne": None}, group_by)
+    else:
+        groups = _totals(latest, group_by)
+    overall = _totals(latest).get((), collections.Counter())
+
+    return {
+        "groupBy": list(group_by),
+        "cohorts": [
+            {**dict(zip(group_by, key)), **_summary(groups[key])}
+            for key in sorted(groups, key=_sort_key)
+        ],
+        "overall": _summary(overall),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.cohort", description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--dashboards", action="store_true",
+                        help="re-materialize every student dashboard first")
+    args = parser.parse_args(argv)
+
+    from mongoengine import connect
+    from config import Config
+    from utils.dashboard_utils import refresh_all_dashboards  # imports this module
+    connect(db=Config.DB_NAME, host=Config.MONGO_URI, alias="default")
+
+    if args.dashboards:
+        print(f"refreshed {refresh_all_dashboards(Config.INGEST_BATCH_SIZE)} dashboards")
+    print(f"rebuilt {rebuild()} cohorts")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,37 @@
 # utils/dashboard_utils.py
+"""
+Student dashboards: semester rows with their risk status.
+
+Dashboards are materialized in StudentDashboard (models/dashboard.py).
+Whatever writes a student's profile, academic or attendance records calls
+`refresh_dashboards` with the StudentProfile ids it touched, which rebuilds
+those dashboards with one aggregation, swaps them in with one bulk write
+and folds the change into the cohort rollups (utils/cohort.py). The route reads
+the stored document and only falls back to `dashboard_pipeline` for
+students written before the read model existed.
+
+The dashboards only mirror data that is already saved, so writers call
+`refresh_dashboards_after_write`, which logs a failed refresh instead of
+failing the write; `python -m utils.cohort rebuild --dashboards` repairs
+what it left stale.
+"""
+import logging
+import time
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from models.academic import AcademicRecord
+from models.attendance import Attendance
+from models.dashboard import StudentDashboard
+from models.student import StudentProfile
+from models.user import User
+from utils.cohort import apply_changes
+
+STORE_ATTEMPTS = 5
+
+logger = logging.getLogger(__name__)
 
 def calculate_risk_status(gpa, attendance, backlogs):
     if gpa >= 7.0 and attendance >= 75 and backlogs == 0:
@@ -6,4 +39,224 @@ def calculate_risk_status(gpa, attendance, backlogs):
     elif 5.0 <= gpa < 7.0 or 65 <= attendance < 75 or 1 <= backlogs <= 2:
         return "Warning"
     else:
-        return "At Risk"
\ No newline at end of file
+        return "At Risk"
+
+def dashboard_pipeline(user_id):
+    """
+    Aggregation over users that assembles one student's dashboard in a
+    single round trip. `user_id` is a User ObjectId or a userId (the
+    ObjectId wins if both match). Yields at most one document:
+    {_id, userId, name, profile: {_id, course, year} (absent without a profile),
+     semesters: [{semester, gpa, cgpa, backlogs, attendancePercentage,
+                  absenteeDays}]} with semesters in no particular order.
+    """
+    match = {"userId": user_id}
+    pipeline = []
+    if ObjectId.is_valid(user_id):
+        oid = ObjectId(user_id)
+        pipeline += [
+            {"$match": {"$or": [{"_id": oid}, match]}},
+            {"$addFields": {"byId": {"$eq": ["$_id", oid]}}},
+            {"$sort": {"byId": -1}},
+        ]
+    else:
+        pipeline.append({"$match": match})
+
+    return pipeline + [
+        {"$limit": 1},
+        {"$project": {"userId": 1, "name": 1}},
+        {"$lookup": {
+            "from": StudentProfile._get_collection_name(),
+            "localField": "_id",
+            "foreignField": "user",
+            "as": "profile",
+        }},
+        {"$unwind": {"path": "$profile", "preserveNullAndEmptyArrays": True}},
+        *_record_stages("profile._id"),
+        {"$project": {
+            "userId": 1,
+            "name": 1,
+            "profile._id": 1,
+            "profile.course": 1,
+            "profile.year": 1,
+            "profile.session_type": 1,
+            "profile.institutionType": 1,
+            "semesters": _SEMESTERS,
+        }},
+    ]
+
+def _record_stages(profile_id):
+    # records are joined to the profile by their (student, semester) index
+    return [
+        {"$lookup": {
+            "from": model._get_collection_name(),
+            "localField": profile_id,
+            "foreignField": "student",
+            "as": into,
+        }}
+        for model, into in ((AcademicRecord, "academics"), (Attendance, "attendance"))
+    ]
+
+# academic records joined with the attendance of the same semester
+_SEMESTERS = {"$map": {"input": "$academics", "as": "rec", "in": {"$let": {
+    "vars": {"att": {"$arrayElemAt": [
+        {"$filter": {
+            "input": "$attendance", "as": "att",
+            "cond": {"$eq": ["$$att.semester", "$$rec.semester"]},
+        }},
+        0,
+    ]}},
+    "in": {
+        "semester": "$$rec.semester",
+        "gpa": "$$rec.gpa",
+        "cgpa": "$$rec.cgpa",
+        "backlogs": "$$rec.backlogs",
+        "attendancePercentage": "$$att.attendancePercentage",
+        "absenteeDays": "$$att.absenteeDays",
+    },
+}}}}
+
+def profiles_pipeline(student_ids):
+    """
+    Aggregation over student profiles yielding, per profile in
+    `student_ids`, the same user/semester data as dashboard_pipeline:
+    {_id, user, course, year, session_type, institutionType,
+     account: {userId, name}, semesters}.
+    """
+    return [
+        {"$match": {"_id": {"$in": list(student_ids)}}},
+        {"$project": {"user": 1, "course": 1, "year": 1, "session_type": 1, "institutionType": 1}},
+        {"$lookup": {
+            "from": User._get_collection_name(),
+            "localField": "user",
+            "foreignField": "_id",
+            "as": "account",
+        }},
+        {"$unwind": "$account"},
+        *_record_stages("_id"),
+        {"$project": {
+            "user": 1,
+            "course": 1,
+            "year": 1,
+            "session_type": 1,
+            "institutionType": 1,
+            "account.userId": 1,
+            "account.name": 1,
+            "semesters": _SEMESTERS,
+        }},
+    ]
+
+def dashboard_rows(semesters):
+    """Dashboard rows, by semester, from the pipeline's `semesters`"""
+    rows = []
+    for sem in sorted(semesters, key=lambda s: s["semester"]):
+        attendancePercentage = sem.get("attendancePercentage")
+        rows.append({
+            "semester": sem["semester"],
+            "gpa": sem.get("gpa"),
+            "cgpa": sem.get("cgpa"),
+            "backlogs": sem.get("backlogs"),
+            "attendancePercentage": attendancePercentage,
+            "absenteeDays": sem.get("absenteeDays"),
+            "riskStatus": calculate_risk_status(
+                sem.get("gpa"),
+                attendancePercentage if attendancePercentage is not None else 100,
+                sem.get("backlogs")
+            )
+        })
+    return rows
+
+def dashboard_document(user, profile, semesters, refreshed_at):
+    """
+    StudentDashboard fields from a user {_id, userId, name} and a profile
+    {_id, course, year, session_type, institutionType}
+    """
+    return {
+        "student": profile["_id"],
+        "user": user["_id"],
+        "userId": user.get("userId"),
+        "name": user.get("name"),
+        "course": profile.get("course"),
+        "year": profile.get("year"),
+        "session_type": profile.get("session_type"),
+        "institutionType": profile.get("institutionType"),
+        "semesters": dashboard_rows(semesters),
+        "refreshed_at": refreshed_at,
+    }
+
+def _replace(current, documents):
+    """
+    Swap in each of `documents` over the stored dashboard `current` holds
+    for its student, if that is still the stored one. Returns the indexes
+    of the documents that lost to a concurrent write.
+    """
+    ops = []
+    for doc in documents:
+        stored = current.get(doc["student"])
+        # an upsert whose filter no longer matches hits the unique index
+        ops.append(ReplaceOne({
+            "student": doc["student"],
+            "refreshed_at": stored["refreshed_at"] if stored else {"$exists": False},
+        }, doc, upsert=True))
+    try:
+        StudentDashboard._get_collection().bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        return {err["index"] for err in errors}
+    return set()
+
+def store_dashboards(documents):
+    """
+    Replace the stored dashboards with `documents`, and the cohort rollups
+    with them. A dashboard is only replaced by one read later than itself,
+    so when imports of the same student race (a bundle writes academics
+    and attendance in parallel) the last read wins, not the last write.
+    """
+    pending = {doc["student"]: doc for doc in documents}
+    collection = StudentDashboard._get_collection()
+    for _ in range(STORE_ATTEMPTS):
+        if not pending:
+            return
+        current = {d["student"]: d for d in collection.find({"student": {"$in": list(pending)}})}
+        newer = [doc for student, doc in pending.items()
+                 if student not in current or current[student]["refreshed_at"] < doc["refreshed_at"]]
+        if not newer:
+            return
+        lost = _replace(current, newer)
+        apply_changes([(current.get(doc["student"]), doc)
+                       for i, doc in enumerate(newer) if i not in lost])
+        pending = {newer[i]["student"]: newer[i] for i in lost}
+    raise RuntimeError(f"dashboards of {len(pending)} students kept changing while being stored")
+
+def refresh_dashboards(student_ids):
+    """Rebuild the dashboards of the given StudentProfile ids from their records"""
+    student_ids = {sid for sid in student_ids if sid is not None}
+    if not student_ids:
+        return
+    refreshed_at = time.time()  # before reading, see store_dashboards
+    found = StudentProfile.objects.aggregate(profiles_pipeline(student_ids))
+    store_dashboards(
+        dashboard_document({"_id": p["user"], **p["account"]}, p, p.get("semesters", []), refreshed_at)
+        for p in found
+    )
+
+def refresh_dashboards_after_write(student_ids):
+    """refresh_dashboards for data that is already saved: failures are logged, not raised"""
+    student_ids = list(student_ids)
+    try:
+        refresh_dashboards(student_ids)
+    except Exception:
+        logger.exception("Dashboard refresh failed for %d students", len(student_ids))
+
+def refresh_all_dashboards(batch_size):
+    """Rebuild every student's dashboard, `batch_size` profiles at a time. Returns the count."""
+    count, batch = 0, []
+    for student_id in StudentProfile.objects.scalar("id"):
+        batch.append(student_id)
+        if len(batch) == batch_size:
+            refresh_dashboards(batch)
+            count, batch = count + len(batch), []
+    refresh_dashboards(batch)
+    return count + len(batch)
@@ -0,0 +1,106 @@
+# utils/importers.py
+"""
+Column specs for each upload, registered by entity name.
+"""
+from models.student import StudentProfile
+from models.academic import AcademicRecord
+from models.attendance import Attendance
+from models.financial import FinancialRecord
+from models.curricular import CurricularUnit
+from utils.dashboard_utils import refresh_dashboards_after_write
+from utils.ingest import Importer
+from utils.validation import Column
+
+
+# SIS export headers (see test_files/students.csv) -> our column names
+STUDENT_ALIASES = {
+    "Age at enrollment": "age",
+    "Gender": "gender",
+    "Educational special needs": "special_needs",
+    "Daytime/evening attendance": "session_type",
+}
+SESSION_CODES = {"1": "day", "0": "evening"}
+
+
+def prepare_student(frame):
+    renames = {alias: key for alias, key in STUDENT_ALIASES.items()
+               if alias in frame.columns and key not in frame.columns}
+    frame = frame.rename(columns=renames)
+    if "session_type" in frame.columns:
+        frame["session_type"] = frame["session_type"].astype("string").replace(SESSION_CODES)
+    return frame
+
+
+def finish_student(doc):
+    doc["socioEconomicBackground"] = {
+        "incomeLevel": doc.pop("incomeLevel", None),
+        "parentOccupation": doc.pop("parentOccupation", None),
+    }
+
+
+STUDENT_COLUMNS = [
+    Column("age", "int", default=0, field="age_at_enrollment"),
+    Column("gender", choices=["Male", "Female", "Other"]),
+    Column("incomeLevel"),
+    Column("parentOccupation"),
+    Column("firstGenStudent", "bool", default=False),
+    Column("background", choices=["rural", "urban"]),
+    Column("course", required=True),
+    Column("year", "int", default=1),
+    Column("semester", "int", default=1),
+    Column("institutionType", default="public", choices=["public", "private"]),
+    Column("special_needs", "bool", default=False),
+    Column("session_type", choices=["day", "evening"]),
+]
+
+ACADEMIC_COLUMNS = [
+    Column("semester", "int", required=True),
+    Column("gpa", "float", default=0),
+    Column("backlogs", "int", default=0),
+]
+
+ATTENDANCE_COLUMNS = [
+    Column("semester", "int", default=0),
+    Column("attendancePercentage", "float", default=0),
+    Column("absenteeDays", "int", default=0),
+]
+
+FINANCIAL_COLUMNS = [
+    Column("tuitionStatus", default="on-time", choices=["on-time", "delayed"]),
+    Column("scholarship", "bool", default=False),
+    Column("loanDependency", "bool", default=False),
+    Column("partTimeJob", "bool", default=False),
+]
+
+CURRICULAR_COLUMNS = [
+    Column("semester", "int", default=0),
+    Column("enrolled_units", "int", default=0),
+    Column("approved_units", "int", default=0),
+    Column("average_grade", "float", default=0),
+]
+
+
+def refresh_profiles(docs):
+    refresh_dashboards_after_write(doc["_id"] for doc in docs)
+
+
+def refresh_students(docs):
+    refresh_dashboards_after_write(doc["student"] for doc in docs)
+
+
+# Semester-wise records are unique per (student, semester)
+SEMESTER_KEY = ("student", "semester")
+SEMESTER_DUPLICATE = "Record for this semester already exists (use mode=upsert to overwrite)"
+
+IMPORTERS = {
+    "student": Importer("student", StudentProfile, STUDENT_COLUMNS, lookup="user",
+                        duplicate_reason="Student profile already exists",
+                        prepare=prepare_student, finish=finish_student, on_write=refresh_profiles),
+    "academic": Importer("academic", AcademicRecord, ACADEMIC_COLUMNS, key_fields=SEMESTER_KEY,
+                         duplicate_reason=SEMESTER_DUPLICATE, on_write=refresh_students),
+    "attendance": Importer("attendance", Attendance, ATTENDANCE_COLUMNS, key_fields=SEMESTER_KEY,
+                           duplicate_reason=SEMESTER_DUPLICATE, on_write=refresh_students),
+    "financial": Importer("financial", FinancialRecord, FINANCIAL_COLUMNS),
+    "curricular": Importer("curricular", CurricularUnit, CURRICULAR_COLUMNS, key_fields=SEMESTER_KEY,
+                           duplicate_reason=SEMESTER_DUPLICATE),
+}
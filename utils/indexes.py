@@ -0,0 +1,192 @@
+# utils/indexes.py
+"""
+Index management for every model in models/.
+
+    python -m utils.indexes diff    # declared vs live indexes
+    python -m utils.indexes build   # create missing declared indexes
+    python -m utils.indexes stats   # $indexStats usage; flags unused indexes
+    python -m utils.indexes dedupe [--dry-run]  # clear duplicates blocking unique indexes
+
+Declared indexes are each Document's meta["indexes"] plus unique fields,
+as mongoengine computes them. `build` only creates what is missing, so it
+is safe to run on every deploy, before the new code first touches a
+collection (mongoengine would otherwise create them in the foreground
+then); on MongoDB 4.2+ builds only lock the collection briefly at start
+and end, and `background` is passed for older servers. Nothing is ever
+dropped: extra and unused indexes are reported for a human to decide.
+
+A unique index can't build over duplicate keys. `dedupe` finds them for
+every declared unique index that is not live yet and keeps the newest
+document (highest _id) of each key; run it before `build` when a unique
+index is added to a collection that may already hold duplicates. Models
+whose indexes need this set auto_create_index False, so nothing writes to
+them unchecked before `build` succeeds. A model may define
+`prepare_indexes(dry_run)` to clean values up first, and set
+`dedupe_deletes = False` to have its duplicates reported, not deleted.
+"""
+import argparse
+import importlib
+import pkgutil
+import sys
+
+from mongoengine import Document, connect
+from mongoengine.base import _document_registry
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+import models
+
+# Index options compared by `diff` (anything else, like the name, may differ)
+OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def documents():
+    """Every concrete Document defined in models/, by collection name"""
+    for module in pkgutil.iter_modules(models.__path__):
+        importlib.import_module(f"models.{module.name}")
+    found = {}
+    for cls in _document_registry.values():
+        if issubclass(cls, Document) and not cls._meta.get("abstract") and cls.__module__.startswith("models."):
+            found[cls._get_collection_name()] = cls
+    return dict(sorted(found.items()))
+
+
+def _options(spec):
+    return {k: spec[k] for k in OPTIONS if spec.get(k) is not None and spec.get(k) is not False}
+
+
+def _collection(cls):
+    # not cls._get_collection(): that would create the indexes on first use
+    return cls._get_db()[cls._get_collection_name()]
+
+
+def declared(cls):
+    """{key tuple: options} of the indexes `cls` declares"""
+    return {tuple(spec["fields"]): _options(spec) for spec in cls._meta["index_specs"]}
+
+
+def live(collection):
+    """{key tuple: (name, options)} of the indexes on `collection`, _id excluded"""
+    return {
+        tuple((field, int(d) if isinstance(d, float) else d) for field, d in info["key"]): (name, _options(info))
+        for name, info in collection.index_information().items()
+        if name != "_id_"
+    }
+
+
+def diff(cls):
+    """(missing, changed, extra): declared keys not live, live with other options, live but undeclared"""
+    want, have = declared(cls), live(_collection(cls))
+    missing = [key for key in want if key not in have]
+    changed = [key for key in want if key in have and have[key][1] != want[key]]
+    extra = [have[key][0] for key in have if key not in want]
+    return missing, changed, extra
+
+
+def build(cls):
+    """Create the declared indexes `cls` lacks. Returns their names."""
+    missing, _, _ = diff(cls)
+    if not missing:
+        return []
+    want = declared(cls)
+    return _collection(cls).create_indexes(
+        [IndexModel(list(key), background=True, **want[key]) for key in missing]
+    )
+
+
+def duplicates(cls, key, sparse=False):
+    """[[_id, ...] newest first] of the documents sharing a value of index `key`"""
+    fields = [field for field, _ in key]
+    pipeline = [{"$match": {field: {"$exists": True} for field in fields}}] if sparse else []
+    pipeline += [
+        {"$sort": {"_id": -1}},
+        {"$group": {"_id": {f"k{i}": f"${field}" for i, field in enumerate(fields)}, "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ]
+    return [group["ids"] for group in _collection(cls).aggregate(pipeline, allowDiskUse=True)]
+
+
+def dedupe(cls, dry_run=False):
+    """
+    Delete all but the newest document of every key duplicated on a
+    declared unique index that is not live (only count them when
+    `dry_run` or cls.dedupe_deletes is False). Returns {index key: documents}.
+    """
+    missing, _, _ = diff(cls)
+    want = declared(cls)
+    removed = {}
+    for key in missing:
+        if not want[key].get("unique"):
+            continue
+        extra = [oid for ids in duplicates(cls, key, want[key].get("sparse", False)) for oid in ids[1:]]
+        if extra and not dry_run and getattr(cls, "dedupe_deletes", True):
+            _collection(cls).delete_many({"_id": {"$in": extra}})
+        removed[key] = len(extra)
+    return removed
+
+
+def usage(cls):
+    """[(name, ops since, since)] from $indexStats, _id excluded"""
+    stats = _collection(cls).aggregate([{"$indexStats": {}}])
+    return sorted(
+        (s["name"], s["accesses"]["ops"], s["accesses"]["since"])
+        for s in stats if s["name"] != "_id_"
+    )
+
+
+def _key(key):
+    return ", ".join(f"{field} {direction}" for field, direction in key)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.indexes", description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["diff", "build", "stats", "dedupe"])
+    parser.add_argument("--dry-run", action="store_true", help="dedupe: only count the duplicates")
+    args = parser.parse_args(argv)
+
+    from config import Config
+    connect(db=Config.DB_NAME, host=Config.MONGO_URI, alias="default")
+
+    problems = 0
+    for name, cls in documents().items():
+        if args.command == "build":
+            try:
+                for index in build(cls):
+                    print(f"{name}: built {index}")
+            except OperationFailure as e:
+                if e.code != 11000:
+                    raise
+                print(f"{name}: duplicate keys, run dedupe first ({e})")
+                problems += 1
+        elif args.command == "dedupe":
+            if hasattr(cls, "prepare_indexes"):
+                count = cls.prepare_indexes(args.dry_run)
+                print(f"{name}: {'would prepare' if args.dry_run else 'prepared'} {count} documents")
+            deletes = getattr(cls, "dedupe_deletes", True)
+            for key, count in dedupe(cls, args.dry_run).items():
+                if not count:
+                    continue
+                if not deletes:
+                    print(f"{name}: {count} duplicates of ({_key(key)}) to resolve by hand")
+                    problems += 1
+                    continue
+                verb = "would remove" if args.dry_run else "removed"
+                print(f"{name}: {verb} {count} duplicates of ({_key(key)})")
+        elif args.command == "diff":
+            missing, changed, extra = diff(cls)
+            for key in missing:
+                print(f"{name}: missing ({_key(key)})")
+            for key in changed:
+                print(f"{name}: options differ on ({_key(key)}), declared {declared(cls)[key]}")
+            for index in extra:
+                print(f"{name}: not declared {index}")
+            problems += len(missing) + len(changed) + len(extra)
+        else:
+            for index, ops, since in usage(cls):
+                flag = "  UNUSED" if ops == 0 else ""
+                print(f"{name}: {index} {ops} ops since {since:%Y-%m-%d %H:%M}{flag}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
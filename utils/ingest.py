@@ -0,0 +1,475 @@
+# utils/ingest.py
+"""
+Shared bulk-ingestion engine used by every CSV upload route.
+
+Uploads (CSV, or Parquet / Arrow IPC when pyarrow is installed) are parsed
+incrementally into fixed-size DataFrame chunks, so peak memory depends on
+the batch size rather than the file size. Columnar files arrive already
+typed, with no text parsing. Each chunk is validated and coerced
+column-wise (utils.validation), all its userIds are resolved with `$in`
+queries, and it is written with a single unordered `insert_many`
+(mode="insert") or `bulk_write` of upserts (mode="upsert").
+"""
+import os
+import threading
+import time
+
+import pandas as pd
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config import Config
+from models.user import User
+from models.student import StudentProfile
+from utils.validation import validate_frame, to_documents
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow uploads are optional
+    pa = pq = None
+
+MAX_BATCH_SIZE = 10000
+
+# What a malformed upload raises while being read (ragged CSV, bad encoding, corrupt columnar file)
+PARSE_ERRORS = (pd.errors.ParserError, UnicodeDecodeError) + ((pa.ArrowInvalid,) if pa else ())
+
+
+class Importer:
+    """
+    Describes how uploaded rows of one entity become documents.
+
+    `columns` is a list of utils.validation.Column. Each document references
+    the StudentProfile (lookup="profile", stored in `student`) or the User
+    (lookup="user", stored in `user`) of the row's userId. `prepare(frame)`
+    may rename or recode raw columns and `finish(doc)` may reshape a built
+    document. `key_fields` names the unique key used by upsert mode;
+    importers without one only support plain inserts. `on_write(docs)`
+    is called with the documents of each batch that were written.
+    """
+
+    def __init__(self, name, model, columns, lookup="profile", key_fields=None,
+                 duplicate_reason="Duplicate record", prepare=None, finish=None, on_write=None):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.lookup = lookup
+        self.ref_field = "user" if lookup == "user" else "student"
+        self.key_fields = key_fields
+        self.duplicate_reason = duplicate_reason
+        self.prepare = prepare
+        self.finish = finish
+        self.on_write = on_write
+        self.defaults = {
+            field.db_field: field.default
+            for name, field in model._fields.items()
+            if name != "id" and field.default is not None
+        }
+
+    @property
+    def modes(self):
+        return ("insert", "upsert") if self.key_fields else ("insert",)
+
+
+def parse_batch_size(value=None):
+    """Clamp a requested batch size, falling back to INGEST_BATCH_SIZE"""
+    try:
+        size = int(value) if value else Config.INGEST_BATCH_SIZE
+    except (TypeError, ValueError):
+        size = Config.INGEST_BATCH_SIZE
+    return max(1, min(size, MAX_BATCH_SIZE))
+
+
+def read_csv_frames(stream, batch_size, encoding="utf-8-sig"):
+    """
+    Yield DataFrames of at most `batch_size` rows from a binary CSV stream
+    (an upload or a spooled file). Cells stay strings; the index is the
+    0-based data row number across the whole file.
+    """
+    try:
+        yield from pd.read_csv(stream, chunksize=batch_size, dtype=str, keep_default_na=False,
+                               encoding=encoding)
+    except pd.errors.EmptyDataError:
+        return
+
+
+def _with_row_index(frame, offset):
+    frame.index = pd.RangeIndex(offset, offset + len(frame))
+    return frame
+
+
+def read_parquet_frames(stream, batch_size):
+    """Yield typed DataFrames of at most `batch_size` rows from a Parquet file's record batches"""
+    offset = 0
+    for batch in pq.ParquetFile(stream).iter_batches(batch_size=batch_size):
+        yield _with_row_index(batch.to_pandas(), offset)
+        offset += batch.num_rows
+
+
+def read_arrow_frames(stream, batch_size):
+    """Yield typed DataFrames of at most `batch_size` rows from an Arrow IPC file or stream"""
+    try:
+        reader = pa.ipc.open_file(stream)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        stream.seek(0)
+        batches = pa.ipc.open_stream(stream)
+
+    offset = 0
+    for batch in batches:
+        for start in range(0, batch.num_rows, batch_size):
+            chunk = batch.slice(start, batch_size)
+            yield _with_row_index(chunk.to_pandas(), offset)
+            offset += chunk.num_rows
+
+
+# format name -> (reader, spool suffix)
+FORMATS = {
+    "csv": (read_csv_frames, ".csv"),
+    "parquet": (read_parquet_frames, ".parquet"),
+    "arrow": (read_arrow_frames, ".arrow"),
+}
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".arrows": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+FORMAT_MIMETYPES = {
+    "text/csv": "csv",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/vnd.apache.arrow.stream": "arrow",
+}
+
+
+def detect_format(filename=None, mimetype=None):
+    """
+    Pick an upload format from the content type, then the file extension,
+    defaulting to CSV. Raises ValueError for columnar files without pyarrow.
+    """
+    fmt = FORMAT_MIMETYPES.get(mimetype or "")
+    if not fmt:
+        fmt = FORMAT_EXTENSIONS.get(os.path.splitext(filename or "")[1].lower(), "csv")
+    if fmt != "csv" and pa is None:
+        raise ValueError(f"{fmt} uploads require pyarrow to be installed")
+    return fmt
+
+
+def resolve_users(user_ids):
+    """userId -> User ObjectId, one query"""
+    if not user_ids:
+        return {}
+    return dict(User.objects(userId__in=list(user_ids)).scalar("userId", "id"))
+
+
+def resolve_profiles(user_map):
+    """User ObjectId -> StudentProfile ObjectId, one query"""
+    if not user_map:
+        return {}
+    profiles = StudentProfile.objects(user__in=list(user_map.values())).only("user").as_pymongo()
+    return {p["user"]: p["_id"] for p in profiles}
+
+
+class Resolver:
+    """Resolves every batch from scratch with two `$in` queries"""
+
+    def users(self, user_ids):
+        return resolve_users(user_ids)
+
+    def profiles(self, user_map):
+        return resolve_profiles(user_map)
+
+    def assume_profiles(self, user_oids):
+        """Dry runs: the student import would create profiles for these users"""
+
+
+class SharedResolver(Resolver):
+    """
+    Caches userId -> User and User -> StudentProfile lookups so several
+    imports (possibly running in parallel threads) resolve each id once.
+    Misses are cached as None, so call `warm_profiles()` only after all
+    profiles that should exist have been written.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def users(self, user_ids):
+        missing = [u for u in user_ids if u not in self._users]
+        if missing:
+            found = resolve_users(missing)
+            with self._lock:
+                self._users.update({u: found.get(u) for u in missing})
+        return {u: self._users[u] for u in user_ids if self._users.get(u)}
+
+    def profiles(self, user_map):
+        missing = {u: oid for u, oid in user_map.items() if oid not in self._profiles}
+        if missing:
+            found = resolve_profiles(missing)
+            with self._lock:
+                self._profiles.update(found)
+        return {oid: self._profiles[oid] for oid in user_map.values() if self._profiles.get(oid)}
+
+    def warm_profiles(self):
+        """Resolve profiles of every known user in one query and freeze misses"""
+        user_map = {u: oid for u, oid in self._users.items() if oid}
+        found = resolve_profiles(user_map)
+        with self._lock:
+            self._profiles.update({oid: found.get(oid) or self._profiles.get(oid) for oid in user_map.values()})
+
+    def assume_profiles(self, user_oids):
+        with self._lock:
+            for oid in user_oids:
+                self._profiles[oid] = self._profiles.get(oid) or ObjectId()  # placeholder, never written
+
+
+def _failed_rows(error):
+    return {err["index"]: err for err in error.details.get("writeErrors", [])}
+
+
+def _skip_failed(failed, doc_rows, importer, batch):
+    for i, err in failed.items():
+        row_no, user_id = doc_rows[i]
+        reason = importer.duplicate_reason if err.get("code") == 11000 else err.get("errmsg")
+        batch["skipped"].append({"row": row_no, "userId": user_id, "reason": reason})
+
+
+def _drop_repeats(docs, doc_rows, importer, batch, keep_last):
+    """
+    Rows repeating another row's key_fields key within the batch, which the
+    write would reject as existing records: upsert keeps the last, insert the first.
+    """
+    order = range(len(docs) - 1, -1, -1) if keep_last else range(len(docs))
+    labels = " and ".join("userId" if field == importer.ref_field else field for field in importer.key_fields)
+    kept = {}
+    for i in order:
+        key = tuple(docs[i][field] for field in importer.key_fields)
+        if key in kept:
+            row_no, user_id = doc_rows[i]
+            batch["skipped"].append({"row": row_no, "userId": user_id,
+                                     "reason": f"Duplicate row in upload: same {labels} as row {doc_rows[kept[key]][0]}"})
+        else:
+            kept[key] = i
+    keep = sorted(kept.values())
+    return [docs[i] for i in keep], [doc_rows[i] for i in keep]
+
+
+def _insert(docs, doc_rows, importer, batch):
+    failed = {}
+    try:
+        importer.model._get_collection().insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = _failed_rows(e)
+
+    _skip_failed(failed, doc_rows, importer, batch)
+    batch["created"].extend(doc["_id"] for i, doc in enumerate(docs) if i not in failed)
+    return failed
+
+
+def _upsert(docs, doc_rows, importer, batch):
+    ops = [
+        UpdateOne({k: doc[k] for k in importer.key_fields}, {"$set": doc}, upsert=True)
+        for doc in docs
+    ]
+    try:
+        res = importer.model._get_collection().bulk_write(ops, ordered=False)
+        failed, upserted, matched = {}, res.upserted_ids, res.matched_count
+    except BulkWriteError as e:
+        failed = _failed_rows(e)
+        upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+        matched = e.details.get("nMatched", 0)
+
+    _skip_failed(failed, doc_rows, importer, batch)
+    batch["created"].extend(upserted.values())
+    batch["updated"] += matched
+    return failed
+
+
+def user_id_column(frame):
+    """The frame's userId column as objects, None where missing or blank"""
+    if "userId" in frame.columns:
+        user_ids = frame["userId"].where(frame["userId"].str.len() > 0).astype(object)
+    else:
+        user_ids = pd.Series(None, index=frame.index, dtype=object)
+    return user_ids.where(user_ids.notna(), None)
+
+
+def _resolve_refs(user_ids, importer, resolver):
+    """Vectorized userId -> referenced ObjectId, plus the reason for each miss"""
+    user_map = resolver.users(set(user_ids.dropna().unique()))
+    user_oids = user_ids.map(user_map)
+    reasons = pd.Series(None, index=user_ids.index, dtype=object)
+
+    refs = user_oids
+    if importer.lookup == "profile":
+        refs = user_oids.map(resolver.profiles(user_map))
+        reasons = reasons.mask(refs.isna(), "Student profile not found")
+    reasons = reasons.mask(user_oids.isna(), "User not found")
+    return refs, reasons
+
+
+def _process_frame(frame, importer, batch, mode, resolver, dry_run):
+    if importer.prepare:
+        frame = importer.prepare(frame)
+
+    user_ids = user_id_column(frame)
+    row_numbers = frame.index + 1
+
+    typed, reasons = validate_frame(frame, importer.columns)
+    refs, ref_reasons = _resolve_refs(user_ids, importer, resolver)
+    reasons = ref_reasons.fillna(reasons)
+
+    bad = reasons.notna().to_numpy()
+    if bad.any():
+        batch["skipped"].extend(
+            {"row": row, "userId": user_id, "reason": reason}
+            for row, user_id, reason in zip(row_numbers[bad].tolist(), user_ids[bad].tolist(),
+                                            reasons[bad].tolist())
+        )
+
+    good = ~bad
+    batch["valid"] += int(good.sum())
+    if dry_run and importer.lookup == "user":
+        resolver.assume_profiles(refs[good].tolist())
+    if dry_run or not good.any():
+        return
+
+    typed = typed[good]
+    docs = to_documents(typed, importer.columns)
+    for doc, ref in zip(docs, refs[good]):
+        doc[importer.ref_field] = ref
+        for field, default in importer.defaults.items():
+            if field not in doc:
+                doc[field] = default() if callable(default) else default
+        if importer.finish:
+            importer.finish(doc)
+    doc_rows = list(zip(row_numbers[good].tolist(), user_ids[good].tolist()))
+    if importer.key_fields:
+        docs, doc_rows = _drop_repeats(docs, doc_rows, importer, batch, keep_last=mode == "upsert")
+
+    if mode == "upsert":
+        failed = _upsert(docs, doc_rows, importer, batch)
+    else:
+        failed = _insert(docs, doc_rows, importer, batch)
+    if importer.on_write:
+        importer.on_write([doc for i, doc in enumerate(docs) if i not in failed])
+
+
+def _stats(rows_seen, result, batch_size, started):
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows_seen,
+        "inserted": result["inserted"],
+        "updated": result["updated"],
+        "valid": result["valid"],
+        "skipped": result["skipped"],
+        "batchSize": batch_size,
+        "elapsedSeconds": round(elapsed, 3),
+        "rowsPerSec": round(rows_seen / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def _merge(result, batch, error_limit):
+    result["inserted"] += len(batch["created"])
+    result["updated"] += batch["updated"]
+    result["valid"] += batch["valid"]
+    result["skipped"] += len(batch["skipped"])
+    room = error_limit - len(result["errors"])
+    if room > 0:
+        result["errors"].extend(batch["skipped"][:room])
+    for skipped in batch["skipped"]:
+        reason = skipped["reason"].split(":")[0].replace(".", "")
+        result["skippedByReason"][reason] = result["skippedByReason"].get(reason, 0) + 1
+
+
+def run_frames(stream, process, batch_size=None, progress=None, reader=read_csv_frames,
+               sink=None, error_limit=None):
+    """
+    Batch loop shared by every bulk upload. `process(frame, batch)` handles
+    one DataFrame chunk, appending to batch["created"] / batch["skipped"]
+    and bumping batch["updated"] / batch["valid"]; see run_import for the
+    return value and the `progress` / `sink` callbacks.
+    """
+    batch_size = parse_batch_size(batch_size)
+    error_limit = Config.IMPORT_ERROR_LIMIT if error_limit is None else error_limit
+    result = {"inserted": 0, "updated": 0, "valid": 0, "skipped": 0, "errors": [], "skippedByReason": {}}
+    rows_seen = 0
+    started = time.perf_counter()
+
+    for frame in reader(stream, batch_size):
+        if frame.empty:
+            continue
+        rows_seen += len(frame)
+        batch = {"created": [], "skipped": [], "updated": 0, "valid": 0}
+        process(frame, batch)
+        _merge(result, batch, error_limit)
+        if sink:
+            sink(batch["created"], batch["skipped"])
+        if progress:
+            progress(_stats(rows_seen, result, batch_size, started))
+
+    return {
+        "stats": _stats(rows_seen, result, batch_size, started),
+        "errors": result["errors"],
+        "skippedByReason": result["skippedByReason"],
+    }
+
+
+def run_import(stream, importer, batch_size=None, progress=None, mode="insert", resolver=None,
+               reader=read_csv_frames, dry_run=False, sink=None, error_limit=None):
+    """
+    Ingest a binary stream, parsed into DataFrame chunks by `reader`.
+
+    Only a summary is kept in memory: returns {"stats": {...}, "errors":
+    [first `error_limit` skipped rows], "skippedByReason": {...}} where
+    stats carries row counts, elapsed seconds and rows/sec. The full
+    per-batch outcome goes to `sink(created_ids, skipped_rows)`, and
+    `progress(stats)` is called after every batch.
+
+    In upsert mode rows matching an existing `importer.key_fields` key
+    overwrite it and are counted as "updated". Pass a SharedResolver to
+    reuse userId lookups across imports. With `dry_run` rows are resolved
+    and validated but nothing is written; "valid" counts the rows that
+    would have been written.
+    """
+    if mode not in importer.modes:
+        raise ValueError(f"mode '{mode}' is not supported for {importer.name} imports")
+
+    resolver = resolver or Resolver()
+
+    def process(frame, batch):
+        _process_frame(frame, importer, batch, mode, resolver, dry_run)
+
+    return run_frames(stream, process, batch_size, progress, reader, sink, error_limit)
+
+
+def dry_run_report(result):
+    """Shape a run_frames result as the ?dry_run=true response"""
+    stats = result["stats"]
+    return {
+        "dryRun": True,
+        "rows": stats["rows"],
+        "valid": stats["valid"],
+        "skipped": stats["skipped"],
+        "skippedByReason": result["skippedByReason"],
+        "errors": result["errors"],
+        "stats": stats,
+    }
+
+
+def dry_run(stream, importer, batch_size=None, mode="insert", fmt="csv"):
+    """
+    Resolve and validate an upload without writing anything. Returns row
+    counts, skipped rows grouped by reason and a sample of the errors.
+    Duplicate-key conflicts are only detected by a real import.
+    """
+    return dry_run_report(run_import(stream, importer, batch_size, mode=mode, dry_run=True,
+                                     reader=FORMATS[fmt][0]))
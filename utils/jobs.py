@@ -0,0 +1,318 @@
+# utils/jobs.py
+"""
+Background import jobs and the shared body of the upload routes.
+
+Upload routes spool the file to disk, create an ImportJob and hand it to a
+process-wide thread pool, so the HTTP request returns immediately. Progress
+is written back to the ImportJob after every batch, and each batch's created
+ids and skipped rows are stored as an ImportResult so the full outcome can
+be streamed later without ever being held in memory. Bundle jobs run every
+part of a term archive through utils.bundle and report per-part progress;
+provisioning jobs create accounts from a roster through utils.provision.
+
+Jobs only live in this process's pool, so a heartbeat thread touches every
+job the process still owns; on startup fail_stale_jobs() fails queued or
+running jobs whose worker stopped beating (e.g. it was restarted).
+"""
+import contextlib
+import datetime
+import functools
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request, jsonify
+from mongoengine import Q
+
+from config import Config
+from models.import_job import ImportJob, ImportResult
+from utils.bundle import BUNDLE_FILES, run_bundle, zip_members
+from utils.ingest import FORMATS, PARSE_ERRORS, detect_format, dry_run, dry_run_report, run_import
+from utils.provision import run_provision
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=Config.IMPORT_WORKERS, thread_name_prefix="import")
+
+_owned = set()                  # job ids queued or running in this process
+_owned_lock = threading.Lock()
+_heartbeat = None
+
+
+def _beat():
+    while True:
+        time.sleep(Config.IMPORT_HEARTBEAT)
+        with _owned_lock:
+            job_ids = list(_owned)
+        if job_ids:
+            try:
+                ImportJob.objects(job_id__in=job_ids).update(set__heartbeat_at=datetime.datetime.utcnow())
+            except Exception:
+                logger.exception("import job heartbeat failed")
+
+
+def _own(job_id):
+    global _heartbeat
+    with _owned_lock:
+        _owned.add(job_id)
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_beat, name="import-heartbeat", daemon=True)
+            _heartbeat.start()
+
+
+def _release(job_id):
+    with _owned_lock:
+        _owned.discard(job_id)
+
+
+def fail_stale_jobs():
+    """Fail queued/running jobs without a heartbeat for IMPORT_STALE_AFTER. Returns the count."""
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=Config.IMPORT_STALE_AFTER)
+    stale = ImportJob.objects(
+        Q(status__in=["queued", "running"])
+        & (Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at=None, created_at__lt=cutoff))
+    )
+    count = stale.update(set__status="failed", set__finished_at=datetime.datetime.utcnow(),
+                         set__error="Import worker stopped before the job finished; please upload again")
+    if count:
+        logger.warning("marked %d stale import job(s) as failed", count)
+    return count
+
+
+def _submit_file(file, entity, fmt, mode, run):
+    """Spool `file` and queue `run(stream, progress=..., sink=...)` on it as a job"""
+    fd, path = tempfile.mkstemp(prefix=f"{entity}-", suffix=FORMATS[fmt][1], dir=Config.IMPORT_SPOOL_DIR)
+    os.close(fd)
+    file.save(path)
+
+    job = ImportJob(
+        job_id=uuid.uuid4().hex,
+        entity=entity,
+        filename=file.filename,
+        format=fmt,
+        mode=mode,
+    ).save()
+
+    _own(job.job_id)
+    _executor.submit(_run_job, job.job_id, path, run)
+    return job
+
+
+def submit_import(file, importer, batch_size=None, mode="insert", fmt="csv"):
+    """Spool an uploaded file and queue it for ingestion. Returns the ImportJob."""
+    run = functools.partial(run_import, importer=importer, batch_size=batch_size, mode=mode,
+                            reader=FORMATS[fmt][0])
+    return _submit_file(file, importer.name, fmt, mode, run)
+
+
+def submit_provision(file, batch_size=None, fmt="csv"):
+    """Spool a roster and queue account provisioning. Returns the ImportJob."""
+    run = functools.partial(run_provision, batch_size=batch_size, reader=FORMATS[fmt][0])
+    return _submit_file(file, "provision", fmt, "insert", run)
+
+
+def handle_upload(file, importer, label):
+    """
+    Common handling for the per-entity upload routes: checks ?mode= and the
+    file format, answers ?dry_run=true inline, otherwise queues a job.
+    """
+    mode = request.args.get('mode', 'insert')
+    if mode not in importer.modes:
+        return jsonify({"message": f"mode must be one of: {', '.join(importer.modes)}"}), 400
+
+    try:
+        fmt = detect_format(file.filename, file.mimetype)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 415
+
+    batch_size = request.args.get('batch_size')
+    if request.args.get('dry_run') == 'true':
+        try:
+            report = dry_run(file.stream, importer, batch_size, mode, fmt)
+        except PARSE_ERRORS as e:
+            return jsonify({"message": f"Could not read the file: {str(e).strip()}"}), 400
+        return jsonify(report), 200
+
+    job = submit_import(file, importer, batch_size, mode, fmt)
+    return jsonify({
+        "message": f"{label} import queued",
+        "jobId": job.job_id
+    }), 202
+
+
+def _result_sink(job_id):
+    """sink(created, skipped, entity=None) that stores each non-empty batch as an ImportResult"""
+    seq = itertools.count()
+
+    def sink(created, skipped, entity=None):
+        if created or skipped:
+            ImportResult(job_id=job_id, seq=next(seq), entity=entity,
+                         created=created, skipped=skipped).save()
+
+    return sink
+
+
+def _run_job(job_id, path, run):
+    jobs = ImportJob.objects(job_id=job_id)
+    jobs.update(set__status="running", set__started_at=datetime.datetime.utcnow())
+
+    def progress(stats):
+        jobs.update(
+            set__rows_processed=stats["rows"],
+            set__rows_inserted=stats["inserted"],
+            set__rows_updated=stats["updated"],
+            set__rows_skipped=stats["skipped"],
+            set__rows_per_sec=stats["rowsPerSec"],
+        )
+
+    try:
+        with open(path, "rb") as fh:
+            result = run(fh, progress=progress, sink=_result_sink(job_id))
+
+        stats = result["stats"]
+        jobs.update(
+            set__status="completed",
+            set__rows_processed=stats["rows"],
+            set__rows_inserted=stats["inserted"],
+            set__rows_updated=stats["updated"],
+            set__rows_skipped=stats["skipped"],
+            set__rows_per_sec=stats["rowsPerSec"],
+            set__errors=result["errors"],
+            set__skipped_by_reason=result["skippedByReason"],
+            set__finished_at=datetime.datetime.utcnow(),
+        )
+    except Exception as e:
+        logger.exception("import job %s failed", job_id)
+        jobs.update(set__status="failed", set__error=str(e), set__finished_at=datetime.datetime.utcnow())
+    finally:
+        _release(job_id)
+        os.remove(path)
+
+
+def submit_bundle(archive=None, parts=None, batch_size=None, mode="insert"):
+    """
+    Spool a zip archive or a dict of stem -> uploaded CSV (see BUNDLE_FILES)
+    and queue it as one bundle job. Returns the ImportJob.
+    """
+    spool_dir = tempfile.mkdtemp(prefix="bundle-", dir=Config.IMPORT_SPOOL_DIR)
+    if archive:
+        archive.save(os.path.join(spool_dir, "bundle.zip"))
+    for stem, file in (parts or {}).items():
+        file.save(os.path.join(spool_dir, f"{stem}.csv"))
+
+    job = ImportJob(
+        job_id=uuid.uuid4().hex,
+        entity="bundle",
+        filename=archive.filename if archive else ",".join(sorted(parts)),
+        mode=mode,
+    ).save()
+
+    _own(job.job_id)
+    _executor.submit(_run_bundle_job, job.job_id, spool_dir, batch_size, mode)
+    return job
+
+
+def bundle_dry_run(archive=None, parts=None, batch_size=None, mode="insert"):
+    """
+    Resolve and validate a bundle inline without writing anything. Returns
+    the dry-run report of every part plus row totals.
+    """
+    with contextlib.ExitStack() as stack:
+        if archive:
+            zf = stack.enter_context(zipfile.ZipFile(archive.stream))
+            sources = {entity: (lambda name=name: zf.open(name)) for entity, name in zip_members(zf).items()}
+        else:
+            sources = {BUNDLE_FILES[stem]: (lambda file=file: contextlib.nullcontext(file.stream))
+                       for stem, file in parts.items()}
+        results = run_bundle(sources, batch_size, mode, dry_run=True)
+
+    reports = {entity: dry_run_report(result) for entity, result in results.items()}
+    return {
+        "dryRun": True,
+        **{key: sum(report[key] for report in reports.values()) for key in ("rows", "valid", "skipped")},
+        "parts": reports,
+    }
+
+
+def _bundle_sources(spool_dir, stack):
+    archive = os.path.join(spool_dir, "bundle.zip")
+    if os.path.exists(archive):
+        zf = stack.enter_context(zipfile.ZipFile(archive))
+        return {entity: (lambda name=name: zf.open(name)) for entity, name in zip_members(zf).items()}
+
+    sources = {}
+    for stem, entity in BUNDLE_FILES.items():
+        path = os.path.join(spool_dir, f"{stem}.csv")
+        if os.path.exists(path):
+            sources[entity] = lambda path=path: open(path, "rb")
+    return sources
+
+
+def _totals(part_stats, started):
+    totals = {key: sum(stats[key] for stats in part_stats.values())
+              for key in ("rows", "inserted", "updated", "skipped")}
+    elapsed = time.perf_counter() - started
+    totals["rowsPerSec"] = round(totals["rows"] / elapsed, 1) if elapsed > 0 else None
+    return totals
+
+
+def _run_bundle_job(job_id, spool_dir, batch_size, mode):
+    jobs = ImportJob.objects(job_id=job_id)
+    jobs.update(set__status="running", set__started_at=datetime.datetime.utcnow())
+
+    part_stats = {}
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def progress(entity, stats):
+        with lock:
+            part_stats[entity] = stats
+            totals = _totals(part_stats, started)
+            jobs.update(
+                set__parts=dict(part_stats),
+                set__rows_processed=totals["rows"],
+                set__rows_inserted=totals["inserted"],
+                set__rows_updated=totals["updated"],
+                set__rows_skipped=totals["skipped"],
+                set__rows_per_sec=totals["rowsPerSec"],
+            )
+
+    try:
+        with contextlib.ExitStack() as stack:
+            sources = _bundle_sources(spool_dir, stack)
+            if not sources:
+                raise ValueError("bundle contains none of: " + ", ".join(f"{stem}.csv" for stem in BUNDLE_FILES))
+            results = run_bundle(sources, batch_size, mode, progress=progress, sink=_result_sink(job_id))
+
+        part_stats = {entity: result["stats"] for entity, result in results.items()}
+        totals = _totals(part_stats, started)
+        errors, by_reason = [], {}
+        for entity, result in results.items():
+            errors.extend(dict(skipped, entity=entity) for skipped in result["errors"])
+            for reason, count in result["skippedByReason"].items():
+                by_reason[reason] = by_reason.get(reason, 0) + count
+        jobs.update(
+            set__status="completed",
+            set__parts=part_stats,
+            set__rows_processed=totals["rows"],
+            set__rows_inserted=totals["inserted"],
+            set__rows_updated=totals["updated"],
+            set__rows_skipped=totals["skipped"],
+            set__rows_per_sec=totals["rowsPerSec"],
+            set__errors=errors[:Config.IMPORT_ERROR_LIMIT],
+            set__skipped_by_reason=by_reason,
+            set__finished_at=datetime.datetime.utcnow(),
+        )
+    except Exception as e:
+        logger.exception("bundle job %s failed", job_id)
+        jobs.update(set__status="failed", set__error=str(e), set__finished_at=datetime.datetime.utcnow())
+    finally:
+        _release(job_id)
+        shutil.rmtree(spool_dir, ignore_errors=True)
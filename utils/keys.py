@@ -0,0 +1,122 @@
+# utils/keys.py
+"""
+Asymmetric JWT keys (RS256 / EdDSA) with kid-based rotation.
+
+Keys are PEM files in JWT_KEYS_DIR: `<kid>.pem` holds a private key
+(signs and verifies), `<kid>.pub.pem` a public key only (verifies). Tokens
+are signed with JWT_ACTIVE_KID, or the newest private key, and carry its
+kid in the header. Every key in the directory is published at the JWKS
+endpoint, so rotation is: add the new key, switch signing to it, and delete
+the old one once its tokens have expired.
+
+Parsed keys are cached in memory; an unknown kid triggers a re-read of the
+directory (at most every RELOAD_INTERVAL seconds) or, on nodes configured
+with JWT_JWKS_URL, a fetch of that JWKS, so verification stays local.
+Fetches are also limited to one per RELOAD_INTERVAL, and a kid the JWKS
+lacked is remembered as unknown for as long, so tokens with made-up kids
+fail without an outbound request each.
+"""
+import glob
+import os
+import threading
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+
+RELOAD_INTERVAL = 60  # seconds
+MAX_UNKNOWN_KIDS = 1000
+
+
+def _algorithm(public_key):
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    raise ValueError(f"unsupported JWT key type: {type(public_key).__name__}")
+
+
+def _jwk(kid, public_key, alg):
+    to_jwk = jwt.algorithms.RSAAlgorithm if alg == "RS256" else jwt.algorithms.OKPAlgorithm
+    return {**to_jwk.to_jwk(public_key, as_dict=True), "kid": kid, "alg": alg, "use": "sig"}
+
+
+class KeyRing:
+    def __init__(self, keys_dir=None, active_kid=None, jwks_url=None):
+        self.keys_dir = keys_dir
+        self.active_kid = active_kid
+        self._client = jwt.PyJWKClient(jwks_url, cache_keys=True) if jwks_url else None
+        self._keys = {}          # kid -> (public key, alg)
+        self._signing = None     # (kid, private key, alg)
+        self._jwks = {"keys": []}
+        self._loaded_at = 0.0
+        self._fetched_at = None  # last JWKS fetch, monotonic
+        self._unknown = {}       # kid -> when the JWKS was found to lack it
+        self._lock = threading.Lock()
+        if keys_dir:
+            self.load()
+
+    def load(self):
+        """(Re)read every key in keys_dir"""
+        keys, private = {}, {}
+        for path in sorted(glob.glob(os.path.join(self.keys_dir, "*.pem"))):
+            name = os.path.basename(path)[:-len(".pem")]
+            with open(path, "rb") as fh:
+                data = fh.read()
+            if name.endswith(".pub"):
+                kid, public_key = name[:-len(".pub")], load_pem_public_key(data)
+            else:
+                kid, key = name, load_pem_private_key(data, password=None)
+                public_key = key.public_key()
+                private[kid] = (key, os.path.getmtime(path))
+            keys[kid] = (public_key, _algorithm(public_key))
+
+        active = self.active_kid or max(private, key=lambda kid: private[kid][1], default=None)
+        if active and active not in private:
+            raise ValueError(f"JWT_ACTIVE_KID '{active}' has no private key in {self.keys_dir}")
+
+        with self._lock:
+            self._keys = keys
+            self._signing = (active, private[active][0], keys[active][1]) if active else None
+            self._jwks = {"keys": [_jwk(kid, *found) for kid, found in keys.items()]}
+            self._loaded_at = time.monotonic()
+
+    def signing_key(self):
+        """(kid, private key, alg), or None on verify-only nodes"""
+        return self._signing
+
+    def verification_key(self, kid):
+        """(public key, alg) for `kid`, or None if it is unknown"""
+        found = self._keys.get(kid)
+        if found is None and self.keys_dir and time.monotonic() - self._loaded_at > RELOAD_INTERVAL:
+            self.load()
+            found = self._keys.get(kid)
+        if found is None and self._client:
+            found = self._fetch(kid)
+        return found
+
+    def _fetch(self, kid):
+        now = time.monotonic()
+        with self._lock:
+            unknown_since = self._unknown.get(kid)
+            if unknown_since is not None and now - unknown_since < RELOAD_INTERVAL:
+                return None
+            if self._fetched_at is not None and now - self._fetched_at < RELOAD_INTERVAL:
+                return None
+            self._fetched_at = now  # concurrent misses fail fast instead of fetching too
+        try:
+            jwk = self._client.get_signing_key(kid)
+        except jwt.PyJWKClientError:
+            with self._lock:
+                if len(self._unknown) >= MAX_UNKNOWN_KIDS:
+                    self._unknown.clear()
+                self._unknown[kid] = now
+            return None
+        found = (jwk.key, jwk.algorithm_name)
+        with self._lock:
+            self._keys[kid] = found
+        return found
+
+    def jwks(self):
+        return self._jwks
@@ -0,0 +1,95 @@
+# utils/logins.py
+"""
+Buffered lastLogin tracking.
+
+Signin records the login time in memory instead of saving the User. A
+background thread flushes the buffer every LOGIN_FLUSH_INTERVAL seconds (or
+as soon as LOGIN_FLUSH_MAX users are pending) as one unordered bulk_write,
+with repeat logins of the same user coalesced into a single update. `$max`
+keeps flushes from different processes from moving lastLogin backwards.
+With LOGIN_TOUCH_UPDATED_AT off, logins leave updatedAt alone.
+"""
+import atexit
+import datetime
+import logging
+import threading
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from config import Config
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+_pending = {}             # user ObjectId -> latest login time
+_lock = threading.Lock()
+_wake = threading.Event()
+_flusher = None
+
+
+def _run_flusher():
+    while True:
+        _wake.wait(Config.LOGIN_FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception("lastLogin flush failed")
+
+
+def _ensure_flusher():
+    global _flusher
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_run_flusher, name="login-flusher", daemon=True)
+            _flusher.start()
+
+
+def _keep_latest(user_id, when):
+    current = _pending.get(user_id)
+    if current is None or when > current:
+        _pending[user_id] = when
+
+
+def record_login(user_id, when=None):
+    """Buffer a login of the User with ObjectId `user_id`"""
+    when = when or datetime.datetime.utcnow()
+    _ensure_flusher()
+    with _lock:
+        _keep_latest(user_id, when)
+        full = len(_pending) >= Config.LOGIN_FLUSH_MAX
+    if full:
+        _wake.set()
+
+
+def flush():
+    """Write all buffered logins. Returns the number of users updated."""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return 0
+
+    fields = ("lastLogin", "updatedAt") if Config.LOGIN_TOUCH_UPDATED_AT else ("lastLogin",)
+    ops = [
+        UpdateOne({"_id": user_id}, {"$max": {field: when for field in fields}})
+        for user_id, when in pending.items()
+    ]
+    try:
+        User._get_collection().bulk_write(ops, ordered=False)
+    except PyMongoError:
+        # keep them for the next flush, unless a newer login replaced them meanwhile
+        with _lock:
+            for user_id, when in pending.items():
+                _keep_latest(user_id, when)
+        raise
+    return len(ops)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush()
+    except PyMongoError:
+        logger.exception("could not flush %d buffered logins at exit", len(_pending))
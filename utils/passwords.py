@@ -0,0 +1,163 @@
+# utils/passwords.py
+"""
+bcrypt hashing off the request thread.
+
+Interactive hashing (signin, signup, password reset) runs in a small
+dedicated process pool, so a login storm saturates those processes instead
+of the web workers' CPU. At most AUTH_HASH_QUEUE jobs may be in flight;
+beyond that `PasswordHasherBusy` is raised at once and the route answers
+503. Bulk provisioning hashes in a separate pool (HASH_WORKERS) so a large
+roster never queues ahead of logins.
+
+The cost factor is BCRYPT_LOG_ROUNDS, or, when BCRYPT_TARGET_MS is set,
+the highest cost whose hash takes at most that long. The first process to
+calibrate stores the result as the "bcrypt:rounds" Setting and every other
+process uses it, so all workers agree (delete it to recalibrate). Hashes
+are the usual `$2b$` format, and `needs_rehash` tells signin to upgrade a
+hash made with a lower cost.
+"""
+import itertools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from config import Config
+from models.setting import Setting
+
+logger = logging.getLogger(__name__)
+
+# bcrypt ignores everything past 72 bytes (and bcrypt>=5 refuses it)
+MAX_PASSWORD_BYTES = 72
+
+# Bounds for the calibrated cost factor
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+class PasswordHasherBusy(Exception):
+    """AUTH_HASH_QUEUE password jobs are already waiting; retry later"""
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_auth_slots = threading.BoundedSemaphore(Config.AUTH_HASH_QUEUE)
+
+_rounds = None
+_rounds_lock = threading.Lock()
+
+
+def _get_pool(name, workers):
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ProcessPoolExecutor(max_workers=workers)
+        return _pools[name]
+
+
+def _drop_pool(name):
+    with _pools_lock:
+        _pools.pop(name, None)
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(password, pw_hash):
+    password = password.encode("utf-8")
+    if len(password) > MAX_PASSWORD_BYTES:
+        return False
+    return bcrypt.checkpw(password, pw_hash.encode("utf-8"))
+
+
+def _calibrate(target_ms):
+    """Highest cost whose hash takes at most `target_ms` here (each extra round doubles the time)"""
+    probe = 8
+    elapsed = []
+    for _ in range(3):
+        started = time.perf_counter()
+        _hash("calibration", probe)
+        elapsed.append(time.perf_counter() - started)
+    probe_ms = min(elapsed) * 1000
+    rounds = probe + math.floor(math.log2(target_ms / probe_ms))
+    return max(MIN_ROUNDS, min(MAX_ROUNDS, rounds))
+
+
+def _shared_rounds(target_ms):
+    """Calibrated cost stored for `target_ms`, calibrating and storing it if there is none"""
+    setting = Setting.objects(name="bcrypt:rounds").first()
+    if setting and setting.value.get("targetMs") == target_ms:
+        return setting.value["rounds"]
+
+    rounds = _calibrate(target_ms)
+    value = {"targetMs": target_ms, "rounds": rounds}
+    if setting:
+        # BCRYPT_TARGET_MS changed: replace the old calibration
+        Setting.objects(name="bcrypt:rounds").update_one(set__value=value)
+    else:
+        # another process may have stored its calibration first; theirs wins
+        value = Setting.objects(name="bcrypt:rounds").modify(
+            upsert=True, new=True, set_on_insert__value=value).value
+    logger.info("bcrypt cost calibrated to %d for %sms", value["rounds"], target_ms)
+    return value["rounds"]
+
+
+def current_rounds():
+    """Cost factor for new hashes"""
+    global _rounds
+    if _rounds is None:
+        with _rounds_lock:
+            if _rounds is None:
+                if Config.BCRYPT_TARGET_MS:
+                    _rounds = _shared_rounds(Config.BCRYPT_TARGET_MS)
+                else:
+                    _rounds = Config.BCRYPT_LOG_ROUNDS
+    return _rounds
+
+
+def needs_rehash(pw_hash):
+    """True when `pw_hash` was made with a lower cost than new hashes get"""
+    try:
+        return int(pw_hash.split("$")[2]) < current_rounds()
+    except (IndexError, ValueError):
+        return True
+
+
+def _run_auth(fn, *args):
+    if not _auth_slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        return _get_pool("auth", Config.AUTH_HASH_WORKERS).submit(fn, *args).result()
+    except BrokenProcessPool:
+        _drop_pool("auth")  # a worker died; start a fresh pool on the next call
+        raise
+    finally:
+        _auth_slots.release()
+
+
+def hash_password(password):
+    """Hash one password in the auth pool. Raises PasswordHasherBusy when saturated."""
+    return _run_auth(_hash, password, current_rounds())
+
+
+def check_password(password, pw_hash):
+    """Verify one password in the auth pool. Raises PasswordHasherBusy when saturated."""
+    return _run_auth(_check, password, pw_hash)
+
+
+def hash_passwords(passwords, rounds=None):
+    """Hash a list of passwords across the bulk pool, preserving order"""
+    rounds = rounds or current_rounds()
+    if not passwords:
+        return []
+    chunksize = max(1, len(passwords) // (Config.HASH_WORKERS * 4))
+    pool = _get_pool("bulk", Config.HASH_WORKERS)
+    try:
+        return list(pool.map(_hash, passwords, itertools.repeat(rounds), chunksize=chunksize))
+    except BrokenProcessPool:
+        _drop_pool("bulk")
+        raise
@@ -0,0 +1,184 @@
+# utils/principal.py
+"""
+Authenticated principal of a request.
+
+`@require_role(...)` verifies the token and, when asked, loads the User
+and/or the Counselor profile onto flask.g. Access tokens carry the
+user's id, role and status, so views passing user=False (and not
+counselor=True) run on the claims alone.
+
+Two caches sit in front of Mongo:
+- per token, in this process (TTLCache, AUTH_CACHE_TTL): the decoded
+  claims and any raw User / Counselor documents, so repeat requests skip
+  JWT verification; revocation is still checked on every hit
+- per user, shared by the workers on the node (utils/shared_cache.py):
+  userId, role, status and counselor id. Routes that load the User or
+  Counselor take role and status from this record and reuse the cached
+  documents only while its version is unchanged.
+
+Saving or deleting a User or Counselor through mongoengine drops that
+user's shared record, so every worker reloads on its next request. Writes
+that bypass document signals (queryset updates, other nodes) are picked
+up once the record expires (AUTH_SHARED_CACHE_TTL).
+"""
+import functools
+import time
+
+from bson import ObjectId
+from flask import request, jsonify, g
+from mongoengine import signals
+
+from config import Config
+from models.user import User
+from models.counselor import Counselor
+from utils.cache import TTLCache
+from utils.revocation import is_revoked
+from utils.shared_cache import SharedPrincipalCache
+from utils.tokens import decode_jwt
+
+_cache = TTLCache(Config.AUTH_CACHE_SIZE, Config.AUTH_CACHE_TTL)
+_records = SharedPrincipalCache(
+    Config.AUTH_SHARED_CACHE_SLOTS, Config.AUTH_SHARED_CACHE_TTL, Config.AUTH_SHARED_CACHE_PATH
+)
+
+
+def _on_user_change(sender, document, **kwargs):
+    _records.invalidate(document.pk)
+
+
+def _on_counselor_change(sender, document, **kwargs):
+    ref = document._data.get("user")  # avoid dereferencing the User
+    _records.invalidate(getattr(ref, "id", ref))
+
+
+for _signal in (signals.post_save, signals.post_delete):
+    _signal.connect(_on_user_change, sender=User)
+    _signal.connect(_on_counselor_change, sender=Counselor)
+
+
+class Principal:
+    """Token claims plus this request's own copies of the User / Counselor"""
+
+    def __init__(self, claims, user=None, counselor=None):
+        self.claims = claims
+        self.user = user
+        self.counselor = counselor
+
+
+def _bearer_token():
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    return auth_header.split(" ")[1]
+
+
+def _cached(token):
+    entry = _cache.get(token)
+    if entry is None:
+        return None
+    if is_revoked(entry["claims"].get("jti")):
+        _cache.pop(token)
+        return None
+    return entry
+
+
+def _record(entry):
+    """
+    Shared record of the entry's user, loading it on a miss. Drops the
+    entry's documents if they were loaded under another version. None if
+    the user no longer exists.
+    """
+    claims = entry["claims"]
+    uid = entry.get("uid") or (ObjectId(claims["uid"]) if "uid" in claims else None)
+    record = _records.get(uid) if uid else None
+
+    if record is None:
+        seen = _records.invalidations()
+        # tokens issued before the uid claim: find the user by userId
+        query = {"id": uid} if uid else {"userId": claims["userId"]}
+        user = User.objects(**query).as_pymongo().first()
+        if not user:
+            return None
+        counselor = None
+        if user["role"] == "counselor":
+            counselor = Counselor.objects(user=user["_id"]).only("id").as_pymongo().first()
+        record = _records.put(user["_id"], user["userId"], user["role"], user.get("status", "active"),
+                              counselor["_id"] if counselor else None, seen=seen)
+        entry.pop("counselor", None)
+        entry.update(uid=user["_id"], user=user, version=record.version)
+
+    if entry.get("version") != record.version:
+        entry.pop("user", None)
+        entry.pop("counselor", None)
+        entry.update(uid=record.user_id, version=record.version)
+    return record
+
+
+def authenticate(roles=(), counselor=False, user=True):
+    """
+    Resolve the request's bearer token. Returns (principal, None, None) or
+    (None, error response, status code) like the route helpers do. With
+    user=False the User is not loaded and principal.user is None.
+    """
+    token = _bearer_token()
+    if not token:
+        return None, jsonify({"message": "Missing or invalid token"}), 401
+
+    entry = _cached(token)
+    claims = entry["claims"] if entry else decode_jwt(token)
+    if not claims:
+        return None, jsonify({"message": "Token is invalid or expired"}), 401
+    if entry is None:
+        entry = {"claims": claims}
+        _cache.set(token, entry, ttl=claims["exp"] - time.time())
+
+    role, status = claims.get("role"), claims.get("status", "active")
+    record = None
+    if user or counselor or "uid" not in claims:
+        record = _record(entry)
+        if record is None:
+            return None, jsonify({"message": "User not found"}), 404
+        role, status = record.role, record.status
+
+    if roles and role not in roles:
+        return None, jsonify({"message": "Unauthorized"}), 403
+    if status != "active":
+        return None, jsonify({"message": "Account is inactive"}), 403
+
+    if user and "user" not in entry:
+        entry["user"] = User.objects(id=record.user_id).as_pymongo().first()
+    if user and not entry["user"]:
+        return None, jsonify({"message": "User not found"}), 404
+
+    if counselor and "counselor" not in entry:
+        entry["counselor"] = record.counselor_id and Counselor.objects(
+            id=record.counselor_id).as_pymongo().first()
+    if counselor and not entry["counselor"]:
+        return None, jsonify({"message": "Counselor profile not found"}), 404
+
+    return Principal(
+        claims,
+        User._from_son(entry["user"]) if user else None,
+        Counselor._from_son(entry["counselor"]) if counselor else None,
+    ), None, None
+
+
+def require_role(*roles, counselor=False, user=True):
+    """
+    Decorator for routes that need a bearer token, optionally restricted to
+    `roles`. Sets g.claims and g.user (None with user=False, for views that
+    only need the claims), plus g.counselor when `counselor` is true (404 if
+    the counselor has no profile yet).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            principal, err_resp, code = authenticate(roles, counselor, user)
+            if err_resp:
+                return err_resp, code
+            g.claims = principal.claims
+            g.user = principal.user
+            g.counselor = principal.counselor
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,210 @@
+# utils/provision.py
+"""
+Bulk provisioning of student accounts from a roster file.
+
+Every roster row becomes an active "student" User plus its StudentProfile.
+Per batch, rows are validated column-wise, email/userId uniqueness is
+checked with one `$in` query, blank userIds are filled from one reserved
+range (allocate_user_ids), initial passwords are hashed across the process
+pool (utils.passwords), and users and profiles are each written with one
+unordered `insert_many`. The unique indexes have the last word: a
+generated userId that clashes anyway is replaced and retried.
+"""
+import datetime
+
+from pymongo.errors import BulkWriteError
+
+from models.user import User
+from utils.importers import IMPORTERS
+from utils.ingest import FORMATS, dry_run_report, read_csv_frames, run_frames, user_id_column
+from utils.passwords import MAX_PASSWORD_BYTES, hash_passwords
+from utils.utils import ID_ATTEMPTS, allocate_user_ids, duplicate_key_field
+from utils.validation import Column, validate_frame, to_documents
+
+ROLE = "student"
+
+# Roster columns on top of the student profile columns (see utils.importers)
+ACCOUNT_COLUMNS = [
+    Column("name", required=True),
+    Column("email"),
+    Column("password", required=True),
+]
+
+PROFILE = IMPORTERS["student"]
+
+
+def _flag(reasons, mask, reason):
+    """Set `reason` on rows in `mask` that have no reason yet"""
+    return reasons.where(reasons.notna() | ~mask, reason)
+
+
+def _taken(user_ids, emails):
+    """userIds and emails of `user_ids` / `emails` already on a User, in one query"""
+    found = User._get_collection().find(
+        {"$or": [{"userId": {"$in": user_ids}}, {"email": {"$in": emails}}]},
+        {"userId": 1, "email": 1},
+    )
+    taken_ids, taken_emails = set(), set()
+    for user in found:
+        taken_ids.add(user["userId"])
+        if user.get("email"):  # else every blank roster email would match
+            taken_emails.add(user["email"])
+    return taken_ids, taken_emails
+
+
+def _check_rows(frame, seen):
+    """Validate a roster chunk. Returns (typed, given userIds, emails, reasons)"""
+    frame = PROFILE.prepare(frame)
+    user_ids = user_id_column(frame)
+    typed, reasons = validate_frame(frame, ACCOUNT_COLUMNS + PROFILE.columns)
+    emails = typed["email"]
+
+    too_long = typed["password"].str.encode("utf-8").str.len() > MAX_PASSWORD_BYTES
+    reasons = _flag(reasons, too_long.fillna(False).astype(bool),
+                    f"Password longer than {MAX_PASSWORD_BYTES} bytes")
+
+    # duplicates within the roster, earlier batches included
+    for values, key, label in ((user_ids, "userId", "userId"), (emails, "email", "email")):
+        ok = reasons.isna() & values.notna()
+        dup = values[ok].duplicated() | values[ok].isin(seen[key])
+        reasons = _flag(reasons, dup.reindex(values.index, fill_value=False),
+                        f"Duplicate {label} in roster")
+
+    ok = reasons.isna()
+    taken_ids, taken_emails = _taken(user_ids[ok & user_ids.notna()].tolist(),
+                                     emails[ok & emails.notna()].tolist())
+    reasons = _flag(reasons, user_ids.isin(taken_ids), "userId already exists")
+    reasons = _flag(reasons, emails.isin(taken_emails), "email already in use")
+
+    ok = reasons.isna()
+    seen["userId"].update(user_ids[ok].dropna())
+    seen["email"].update(emails[ok].dropna())
+    return typed, user_ids, emails, reasons
+
+
+def _skip(batch, rows, reasons):
+    """rows are (row number, userId, email) tuples"""
+    batch["skipped"].extend(
+        {"row": row, "userId": user_id, "email": email, "reason": reason}
+        for (row, user_id, email), reason in zip(rows, reasons)
+    )
+
+
+def _insert_failures(collection, docs):
+    try:
+        collection.insert_many(docs, ordered=False)
+        return {}
+    except BulkWriteError as e:
+        return {err["index"]: err for err in e.details.get("writeErrors", [])}
+
+
+def _id_clash(err):
+    return err.get("code") == 11000 and duplicate_key_field(err) in ("userId", None)
+
+
+def _insert_users(users, generated):
+    """
+    insert_many `users`, moving rows whose generated userId (indexes in
+    `generated`) clashes onto freshly allocated ids. Returns {index: error}
+    for the rows that could not be inserted.
+    """
+    collection = User._get_collection()
+    failed, pending = {}, list(range(len(users)))
+    for attempt in range(ID_ATTEMPTS):
+        errors = _insert_failures(collection, [users[i] for i in pending])
+        errors = {pending[j]: err for j, err in errors.items()}
+        last = attempt == ID_ATTEMPTS - 1
+        pending = [i for i, err in errors.items() if i in generated and _id_clash(err) and not last]
+        failed.update((i, err) for i, err in errors.items() if i not in pending)
+        if not pending:
+            break
+        for i, user_id in zip(pending, allocate_user_ids(ROLE, len(pending))):
+            users[i]["userId"] = user_id
+    return failed
+
+
+def _insert_error(err):
+    if err.get("code") != 11000:
+        return err.get("errmsg")
+    return "email already in use" if duplicate_key_field(err) == "email" else "userId already exists"
+
+
+def _process_frame(frame, batch, seen, dry_run):
+    typed, user_ids, emails, reasons = _check_rows(frame, seen)
+    row_numbers = frame.index + 1
+
+    bad = reasons.notna().to_numpy()
+    if bad.any():
+        _skip(batch, zip(row_numbers[bad].tolist(), user_ids[bad].tolist(), emails[bad].tolist()),
+              reasons[bad].tolist())
+
+    good = ~bad
+    batch["valid"] += int(good.sum())
+    if dry_run or not good.any():
+        return
+
+    typed = typed[good]
+    user_ids = user_ids[good].tolist()
+    missing = [i for i, user_id in enumerate(user_ids) if user_id is None]
+    for i, user_id in zip(missing, allocate_user_ids(ROLE, len(missing))):
+        user_ids[i] = user_id
+
+    now = datetime.datetime.utcnow()
+    hashes = hash_passwords(typed["password"].tolist())
+    users = [
+        {k: v for k, v in {
+            "userId": user_id, "name": name, "email": email, "passwordHash": pw_hash,
+            "role": ROLE, "status": "active", "createdAt": now, "updatedAt": now,
+        }.items() if v is not None}
+        for user_id, name, email, pw_hash in zip(user_ids, typed["name"], typed["email"], hashes)
+    ]
+
+    failed = _insert_users(users, set(missing))
+    rows = list(zip(row_numbers[good].tolist(), [u["userId"] for u in users], typed["email"].tolist()))
+    _skip(batch, [rows[i] for i in failed], [_insert_error(err) for err in failed.values()])
+
+    profile_fields = [c.field for c in PROFILE.columns]
+    profiles, profile_rows = [], []
+    for i, doc in enumerate(to_documents(typed[profile_fields], PROFILE.columns)):
+        if i in failed:
+            continue
+        doc["user"] = users[i]["_id"]
+        for field, default in PROFILE.defaults.items():
+            if field not in doc:
+                doc[field] = default() if callable(default) else default
+        PROFILE.finish(doc)
+        profiles.append(doc)
+        profile_rows.append(i)
+
+    # a user without a profile can't use the app, so roll those accounts back
+    profile_failed = _insert_failures(PROFILE.model._get_collection(), profiles)
+    if profile_failed:
+        orphans = {profile_rows[j]: err for j, err in profile_failed.items()}
+        User._get_collection().delete_many({"_id": {"$in": [users[i]["_id"] for i in orphans]}})
+        _skip(batch, [rows[i] for i in orphans],
+              [f"Profile not created: {err.get('errmsg')}" for err in orphans.values()])
+        failed.update(orphans)
+    PROFILE.on_write([doc for j, doc in enumerate(profiles) if j not in profile_failed])
+
+    batch["created"].extend(users[i]["_id"] for i in range(len(users)) if i not in failed)
+
+
+def run_provision(stream, batch_size=None, progress=None, reader=read_csv_frames, dry_run=False,
+                  sink=None, error_limit=None):
+    """
+    Create student accounts from a roster (userId, name, email, password
+    plus the student profile columns). Same batching, return value and
+    callbacks as utils.ingest.run_import; created ids are User ids.
+    With `dry_run` rows are validated and checked for uniqueness only.
+    """
+    seen = {"userId": set(), "email": set()}
+
+    def process(frame, batch):
+        _process_frame(frame, batch, seen, dry_run)
+
+    return run_frames(stream, process, batch_size, progress, reader, sink, error_limit)
+
+
+def provision_dry_run(stream, batch_size=None, fmt="csv"):
+    """Validate a roster and check uniqueness without hashing or writing anything"""
+    return dry_run_report(run_provision(stream, batch_size, reader=FORMATS[fmt][0], dry_run=True))
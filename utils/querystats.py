@@ -0,0 +1,160 @@
+# utils/querystats.py
+"""
+Per-request Mongo command statistics and N+1 detection.
+
+`LISTENER` is a pymongo CommandListener passed to `connect()`; `init_app`
+hooks it into Flask. During a request every command is counted, timed and
+reduced to its shape (command, collection and filter with the values
+blanked out). A shape repeated QUERY_N_PLUS_ONE times in one request is
+flagged as an N+1 and logged with the endpoint.
+
+In debug mode (or with QUERY_STATS_HEADERS) each response carries
+X-DB-Queries, X-DB-Time-Ms and X-DB-N-Plus-One. Either way, totals are
+aggregated per endpoint in this process; `snapshot()` returns them and
+GET /api/ops/queries serves them to admins.
+"""
+import collections
+import contextvars
+import json
+import logging
+import threading
+
+from flask import request
+from pymongo import monitoring
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Keys holding the filter of each command we care about
+_FILTERS = {
+    "find": "filter", "count": "query", "distinct": "query",
+    "findAndModify": "query", "aggregate": "pipeline",
+}
+_BULK = {"update": "updates", "delete": "deletes"}  # list of {"q": filter, ...}
+
+
+def _blank(value):
+    """`value` with every scalar replaced by "?" ($in lists collapse to one)"""
+    if isinstance(value, dict):
+        return {k: _blank(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_blank(value[0])] if value else []
+    return "?"
+
+
+def shape(command_name, command):
+    """Query shape of a command: same shape, same query with other values"""
+    collection = command.get("collection" if command_name == "getMore" else command_name)
+    query = None
+    if command_name in _FILTERS:
+        query = command.get(_FILTERS[command_name])
+    elif command_name in _BULK and command.get(_BULK[command_name]):
+        query = command[_BULK[command_name]][0].get("q")
+    blanked = json.dumps(_blank(query), sort_keys=True) if query is not None else ""
+    return f"{command_name} {collection} {blanked}".rstrip()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_micros = 0
+        self.shapes = collections.Counter()
+
+    def n_plus_one(self):
+        return {s: n for s, n in self.shapes.items() if n >= Config.QUERY_N_PLUS_ONE}
+
+
+_current = contextvars.ContextVar("query_stats", default=None)
+
+
+class QueryListener(monitoring.CommandListener):
+    """Attributes commands to the request running on the calling thread"""
+
+    def __init__(self):
+        self._pending = {}  # (connection, request id) -> shape
+
+    def started(self, event):
+        if _current.get() is not None:
+            self._pending[(event.connection_id, event.request_id)] = shape(event.command_name, event.command)
+
+    def _finished(self, event):
+        stats = _current.get()
+        command_shape = self._pending.pop((event.connection_id, event.request_id), None)
+        if stats is None or command_shape is None:
+            return
+        stats.queries += 1
+        stats.db_micros += event.duration_micros
+        stats.shapes[command_shape] += 1
+
+    succeeded = _finished
+    failed = _finished
+
+
+LISTENER = QueryListener()
+
+_endpoints = {}  # endpoint -> totals
+_lock = threading.Lock()
+
+
+def _record(endpoint, stats, flagged):
+    with _lock:
+        totals = _endpoints.setdefault(endpoint, {
+            "requests": 0, "queries": 0, "dbMs": 0.0, "maxQueries": 0, "nPlusOne": 0, "shapes": {},
+        })
+        totals["requests"] += 1
+        totals["queries"] += stats.queries
+        totals["dbMs"] += stats.db_micros / 1000
+        totals["maxQueries"] = max(totals["maxQueries"], stats.queries)
+        if flagged:
+            totals["nPlusOne"] += 1
+            for command_shape, count in flagged.items():
+                totals["shapes"][command_shape] = max(totals["shapes"].get(command_shape, 0), count)
+
+
+def snapshot():
+    """Per-endpoint totals since start: requests, queries, dbMs, averages, N+1 shapes"""
+    with _lock:
+        return {
+            endpoint: {
+                **totals,
+                "shapes": dict(totals["shapes"]),
+                "avgQueries": round(totals["queries"] / totals["requests"], 2),
+                "avgDbMs": round(totals["dbMs"] / totals["requests"], 3),
+            }
+            for endpoint, totals in _endpoints.items()
+        }
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+
+
+def init_app(app):
+    """Count the commands of every request served by `app`"""
+
+    @app.before_request
+    def _start():
+        _current.set(RequestStats())
+
+    @app.after_request
+    def _finish(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        flagged = stats.n_plus_one()
+        endpoint = request.endpoint or request.path
+        if flagged:
+            logger.warning("N+1 queries in %s: %s", endpoint,
+                           "; ".join(f"{n}x {s}" for s, n in flagged.items()))
+        _record(endpoint, stats, flagged)
+        if Config.QUERY_STATS_HEADERS or app.debug:
+            response.headers["X-DB-Queries"] = str(stats.queries)
+            response.headers["X-DB-Time-Ms"] = f"{stats.db_micros / 1000:.2f}"
+            response.headers["X-DB-N-Plus-One"] = str(len(flagged))
+        return response
+
+    @app.teardown_request
+    def _stop(exc):
+        _current.set(None)  # the worker thread's next commands may not be a request's
@@ -0,0 +1,170 @@
+# utils/ratelimit.py
+"""
+Token-bucket rate limiting for the credential endpoints.
+
+`@rate_limit(scope)` checks one bucket per client IP and, when the JSON
+body names an account (userId or email), one per account, before the view
+runs, so throttled requests never reach bcrypt or the database. Limits
+are "<count>/<seconds>": bursts of up to `count`, refilled evenly over
+`seconds`.
+
+Buckets live in a backend chosen by RATE_LIMIT_BACKEND:
+- "memory" (default): an LRU dict in this process, swept of idle buckets
+  every RATE_LIMIT_SWEEP seconds and capped at RATE_LIMIT_MAX_KEYS (the
+  least recently used bucket is dropped first)
+- "mongo": the rate_limits collection, one atomic update per check, shared
+  by every worker
+- "package.module:Class": any class with `take(key, capacity, rate)`
+  returning 0 when allowed, else the seconds until the next token
+"""
+import collections
+import datetime
+import functools
+import importlib
+import math
+import threading
+import time
+
+from flask import request, jsonify
+from mongoengine.connection import get_db
+from pymongo import ReturnDocument
+
+from config import Config
+
+
+def parse_limit(limit):
+    """Parse "20/60" into (capacity 20, refill rate 20/60 tokens per second)"""
+    count, seconds = limit.split("/")
+    return float(count), float(count) / float(seconds)
+
+
+class MemoryBackend:
+    """Per-process buckets: key -> (tokens, updated_at, full_at) on the monotonic clock"""
+
+    def __init__(self, sweep_every=None, max_keys=None):
+        self.sweep_every = sweep_every or Config.RATE_LIMIT_SWEEP
+        self.max_keys = max_keys or Config.RATE_LIMIT_MAX_KEYS
+        self._buckets = collections.OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + self.sweep_every
+
+    def _sweep(self, now):
+        # a bucket that has refilled completely is the same as no bucket
+        self._buckets = collections.OrderedDict((k, b) for k, b in self._buckets.items() if b[2] > now)
+        self._next_sweep = now + self.sweep_every
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                while len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+                bucket = (capacity, now, now)
+            else:
+                self._buckets.move_to_end(key)
+            tokens, updated, _ = bucket
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            return wait
+
+
+class MongoBackend:
+    """Buckets shared by all workers in the rate_limits collection, expired by a TTL index"""
+
+    collection_name = "rate_limits"
+
+    def __init__(self):
+        self._indexed = False
+
+    def _collection(self):
+        collection = get_db()[self.collection_name]
+        if not self._indexed:
+            collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+        return collection
+
+    def take(self, key, capacity, rate):
+        now = datetime.datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]},
+                                                 {"$multiply": [elapsed, rate]}]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated_at": now}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                "expires_at": now + datetime.timedelta(seconds=capacity / rate),
+            }},
+        ]
+        bucket = self._collection().find_one_and_update(
+            {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return 0 if bucket["allowed"] else (1 - bucket["tokens"]) / rate
+
+
+def _load_backend(name):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "mongo":
+        return MongoBackend()
+    module, _, cls = name.partition(":")
+    return getattr(importlib.import_module(module), cls)()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _load_backend(Config.RATE_LIMIT_BACKEND)
+        return _backend
+
+
+def _account(data):
+    account = data.get("userId") or data.get("email")
+    return str(account).strip().lower() if account else None
+
+
+def _too_many(wait):
+    retry_after = str(max(1, math.ceil(wait)))
+    return jsonify({"message": "Too many requests, please retry later"}), 429, {"Retry-After": retry_after}
+
+
+def rate_limit(scope, per_ip=None, per_account=None):
+    """
+    Decorator throttling a view per client IP and per account named in the
+    JSON body. Limits default to RATE_LIMIT_IP / RATE_LIMIT_ACCOUNT;
+    pass per_account=False to only limit by IP.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not Config.RATE_LIMIT_ENABLED:
+                return view(*args, **kwargs)
+
+            backend = get_backend()
+            wait = backend.take(f"ip:{scope}:{request.remote_addr}", *parse_limit(per_ip or Config.RATE_LIMIT_IP))
+            if wait:
+                return _too_many(wait)
+
+            account = _account(request.get_json(silent=True) or {}) if per_account is not False else None
+            if account:
+                limit = parse_limit(per_account or Config.RATE_LIMIT_ACCOUNT)
+                wait = backend.take(f"account:{scope}:{account}", *limit)
+                if wait:
+                    return _too_many(wait)
+
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
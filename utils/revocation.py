@@ -0,0 +1,73 @@
+# utils/revocation.py
+"""
+Server-side token revocation.
+
+Revoked jtis live in the revoked_tokens collection (TTL-indexed on the
+token's expiry) and are mirrored into an in-process dict, so `is_revoked`
+is a dict lookup. At most every REVOCATION_REFRESH seconds one caller also
+pulls the revocations made since the last sync by any process; tokens
+revoked in this process are rejected immediately.
+"""
+import datetime
+import logging
+import threading
+import time
+
+from pymongo.errors import PyMongoError
+
+from config import Config
+from models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# Re-read a little before the last sync so writes from slightly slower clocks aren't missed
+SYNC_OVERLAP = datetime.timedelta(seconds=30)
+
+_revoked = {}          # jti -> token expiry (UTC)
+_synced_at = None      # revoked_at high-water mark of the last sync
+_next_sync = 0.0       # time.monotonic() of the next sync
+_sync_lock = threading.Lock()
+
+
+def _sync():
+    global _synced_at, _next_sync
+    if not _sync_lock.acquire(blocking=False):
+        return  # another thread is already syncing
+    try:
+        now = datetime.datetime.utcnow()
+        query = RevokedToken.objects(expires_at__gt=now)
+        if _synced_at:
+            query = query.filter(revoked_at__gte=_synced_at - SYNC_OVERLAP)
+        for doc in query.only("jti", "expires_at").as_pymongo():
+            _revoked[doc["jti"]] = doc["expires_at"]
+        for jti, expires_at in list(_revoked.items()):
+            if expires_at <= now:
+                _revoked.pop(jti, None)
+        _synced_at = now
+    except PyMongoError:
+        logger.exception("revoked token sync failed; keeping the previous set")
+    finally:
+        _next_sync = time.monotonic() + Config.REVOCATION_REFRESH
+        _sync_lock.release()
+
+
+def is_revoked(jti):
+    if time.monotonic() >= _next_sync:
+        _sync()
+    return jti is not None and jti in _revoked
+
+
+def revoke(claims):
+    """Revoke a decoded token. Returns False for tokens without a jti (issued before revocation existed)."""
+    jti = claims.get("jti")
+    if not jti:
+        return False
+    expires_at = datetime.datetime.utcfromtimestamp(claims["exp"])
+    RevokedToken.objects(jti=jti).update_one(
+        upsert=True,
+        set__userId=claims.get("userId"),
+        set__expires_at=expires_at,
+        set__revoked_at=datetime.datetime.utcnow(),
+    )
+    _revoked[jti] = expires_at
+    return True
@@ -0,0 +1,65 @@
+# utils/sessions.py
+"""
+Refresh tokens for the short-lived access tokens.
+
+A refresh token is an opaque random string; only its SHA-256 is stored
+(models/refresh_token.py). Each use rotates it: the old token is marked
+used atomically and a new one is issued in the same family. Presenting an
+already used token means it leaked, so the whole family is revoked.
+"""
+import datetime
+import hashlib
+import os
+import secrets
+import uuid
+
+from models.refresh_token import RefreshToken
+
+REFRESH_TOKEN_EXPIRY = int(os.getenv("REFRESH_TOKEN_EXPIRY", 30 * 24 * 3600))  # seconds
+
+
+def _hash(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue_refresh_token(user_id, family=None):
+    """New refresh token for the User with ObjectId `user_id`; starts a family unless given one"""
+    token = secrets.token_urlsafe(32)
+    RefreshToken(
+        token_hash=_hash(token),
+        user=user_id,
+        family=family or uuid.uuid4().hex,
+        expires_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=REFRESH_TOKEN_EXPIRY),
+    ).save()
+    return token
+
+
+def use_refresh_token(token):
+    """
+    Consume a refresh token. Returns its RefreshToken (user, family) or
+    None if it is unknown, expired or was already used.
+    """
+    token_hash = _hash(token)
+    session = RefreshToken.objects(
+        token_hash=token_hash, used=False, expires_at__gt=datetime.datetime.utcnow()
+    ).modify(set__used=True)
+    if session is None:
+        replayed = RefreshToken.objects(token_hash=token_hash, used=True).only("family").first()
+        if replayed:
+            revoke_family(replayed.family)
+    return session
+
+
+def revoke_family(family):
+    RefreshToken.objects(family=family).delete()
+
+
+def revoke_refresh_token(token):
+    """Log a refresh token's whole family out"""
+    session = RefreshToken.objects(token_hash=_hash(token)).only("family").first()
+    if session:
+        revoke_family(session.family)
+
+
+def revoke_user_sessions(user_id):
+    RefreshToken.objects(user=user_id).delete()
@@ -0,0 +1,187 @@
+# utils/shared_cache.py
+"""
+Principal records shared by every worker on a node.
+
+The table lives in a memory-mapped file (AUTH_SHARED_CACHE_PATH, ideally
+under /dev/shm), so N gunicorn workers read one copy that warms once.
+Records are fixed-size and keyed by User ObjectId:
+
+    seq u32 | user id 12s | userId 32s | role 12s | status 12s
+    | counselor id 12s | version u64 | expires_at f64      (100 bytes)
+
+A user hashes to a bucket of BUCKET_SIZE slots; when the bucket is full
+the record closest to expiry is replaced. Readers take no lock: the
+writer makes `seq` odd while it writes, and a read that sees an odd or
+changed `seq` is retried. Writers serialize on flock.
+
+Every stored record gets a new `version` from a counter in the header,
+so a version seen earlier identifies that exact record; `invalidate`
+drops a user's record, and the next `put` for it gets a higher version.
+Without a path the table is an anonymous mapping private to the process.
+"""
+import collections
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from bson import ObjectId
+
+MAGIC = b"SIHAUTH1"
+HEADER = struct.Struct("<8sQQQ")   # magic, slots, last version, invalidations
+HEADER_SIZE = 64
+RECORD = struct.Struct("<I12s32s12s12s12sQd")
+SEQ = struct.Struct("<I")
+BUCKET_SIZE = 4
+EMPTY_ID = bytes(12)
+READ_ATTEMPTS = 8
+
+PrincipalRecord = collections.namedtuple(
+    "PrincipalRecord", "user_id userId role status counselor_id version"
+)
+
+
+def _text(value):
+    return value.rstrip(b"\0").decode("utf-8")
+
+
+class SharedPrincipalCache:
+    def __init__(self, slots, ttl, path=None):
+        self.slots = max(BUCKET_SIZE, slots - slots % BUCKET_SIZE)
+        self.ttl = ttl
+        self.path = path
+        self._size = HEADER_SIZE + self.slots * RECORD.size
+        self._lock = threading.Lock()
+        self._fd = None
+        self._map = None
+
+    # -- setup ---------------------------------------------------------
+
+    def _open(self):
+        if self.path is None:
+            self._map = mmap.mmap(-1, self._size)
+            HEADER.pack_into(self._map, 0, MAGIC, self.slots, 0, 0)
+            return
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            fresh = os.fstat(self._fd).st_size != self._size
+            if not fresh:
+                magic, slots, _, _ = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+                fresh = magic != MAGIC or slots != self.slots
+            if fresh:  # new file, or one laid out by another version
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, self.slots, 0, 0), 0)
+            self._map = mmap.mmap(self._fd, self._size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _mapped(self):
+        # opened on first use, i.e. after gunicorn has forked the worker
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    self._open()
+        return self._map
+
+    @contextlib.contextmanager
+    def _write_locked(self):
+        with self._lock:  # flock doesn't exclude threads sharing the fd
+            if self._fd is None:
+                yield
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    # -- records -------------------------------------------------------
+
+    def _bucket(self, oid):
+        first = zlib.crc32(oid) % (self.slots // BUCKET_SIZE) * BUCKET_SIZE
+        return [HEADER_SIZE + (first + i) * RECORD.size for i in range(BUCKET_SIZE)]
+
+    def _read(self, buf, offset):
+        for _ in range(READ_ATTEMPTS):
+            values = RECORD.unpack_from(buf, offset)
+            if values[0] % 2 == 0 and SEQ.unpack_from(buf, offset)[0] == values[0]:
+                return values
+        return None  # a writer kept it busy; treat as a miss
+
+    def _store(self, buf, offset, values):
+        seq = SEQ.unpack_from(buf, offset)[0]
+        SEQ.pack_into(buf, offset, seq + 1)
+        RECORD.pack_into(buf, offset, seq + 1, *values)
+        SEQ.pack_into(buf, offset, seq + 2)
+
+    def invalidations(self):
+        """Counter to pass to put() as `seen`, read before loading the user"""
+        return HEADER.unpack_from(self._mapped(), 0)[3]
+
+    def get(self, user_id):
+        """The live PrincipalRecord of ObjectId `user_id`, or None"""
+        buf, oid, now = self._mapped(), user_id.binary, time.time()
+        for offset in self._bucket(oid):
+            values = self._read(buf, offset)
+            if values and values[1] == oid and values[7] > now:
+                _, _, user_code, role, status, counselor, version, _ = values
+                return PrincipalRecord(
+                    user_id, _text(user_code), _text(role), _text(status),
+                    ObjectId(counselor) if counselor != EMPTY_ID else None, version,
+                )
+        return None
+
+    def put(self, user_id, userId, role, status, counselor_id=None, seen=None):
+        """
+        Store a record and return it with its version. Nothing is stored
+        (version 0) if a user was invalidated since `seen` was read, since
+        the loaded values may predate that change, or if a field is too
+        long for the layout.
+        """
+        fields = [userId.encode("utf-8"), role.encode("utf-8"), status.encode("utf-8")]
+        record = PrincipalRecord(user_id, userId, role, status, counselor_id, 0)
+        if any(len(f) > size for f, size in zip(fields, (32, 12, 12))):
+            return record
+
+        buf, oid, now = self._mapped(), user_id.binary, time.time()
+        with self._write_locked():
+            magic, slots, version, invalidations = HEADER.unpack_from(buf, 0)
+            if seen is not None and invalidations != seen:
+                return record
+            version += 1
+            HEADER.pack_into(buf, 0, magic, slots, version, invalidations)
+
+            victim = None
+            for offset in self._bucket(oid):
+                values = RECORD.unpack_from(buf, offset)
+                if values[1] == oid or values[7] <= now:
+                    victim = offset
+                    break
+                if victim is None or values[7] < RECORD.unpack_from(buf, victim)[7]:
+                    victim = offset
+            self._store(buf, victim, (
+                oid, *fields, counselor_id.binary if counselor_id else EMPTY_ID, version, now + self.ttl,
+            ))
+        return record._replace(version=version)
+
+    def invalidate(self, user_id):
+        """Drop the record of ObjectId `user_id` in every worker"""
+        buf, oid = self._mapped(), user_id.binary
+        with self._write_locked():
+            magic, slots, version, invalidations = HEADER.unpack_from(buf, 0)
+            HEADER.pack_into(buf, 0, magic, slots, version, invalidations + 1)
+            for offset in self._bucket(oid):
+                if RECORD.unpack_from(buf, offset)[1] == oid:
+                    self._store(buf, offset, (EMPTY_ID, b"", b"", b"", EMPTY_ID, 0, 0.0))
+
+    def clear(self):
+        buf = self._mapped()
+        with self._write_locked():
+            buf[HEADER_SIZE:] = bytes(self._size - HEADER_SIZE)
+
@@ -0,0 +1,91 @@
+# utils/tokens.py
+"""
+JWT helpers shared by the auth routes and the auth decorator.
+
+With JWT_KEYS_DIR (or JWT_JWKS_URL on verify-only nodes) set, tokens are
+signed RS256/EdDSA with a kid header (see utils/keys.py); otherwise they
+fall back to the shared HS256 secret.
+"""
+import datetime, os, uuid
+import jwt  # ✅ PyJWT
+
+from utils.revocation import is_revoked
+
+# Load from env or defaults
+JWT_SECRET = os.getenv("JWT_SECRET", "supersecret")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_EXPIRY = int(os.getenv("JWT_EXPIRY", 900))  # access token lifetime, seconds (see utils/sessions.py for refresh)
+
+# Asymmetric signing
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR")            # <kid>.pem / <kid>.pub.pem
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")        # defaults to the newest private key
+JWT_JWKS_URL = os.getenv("JWT_JWKS_URL")            # fetch unknown kids from here
+JWT_ACCEPT_HS256 = os.getenv("JWT_ACCEPT_HS256", "true").lower() == "true"  # kid-less legacy tokens
+
+_keyring = None
+if JWT_KEYS_DIR or JWT_JWKS_URL:
+    from utils.keys import KeyRing  # needs the cryptography package
+    _keyring = KeyRing(JWT_KEYS_DIR, JWT_ACTIVE_KID, JWT_JWKS_URL)
+
+
+def encode_token(payload):
+    """Sign `payload` with the active key, or the HS256 secret when none is configured"""
+    signing = _keyring.signing_key() if _keyring else None
+    if signing is None:
+        return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    kid, key, alg = signing
+    return jwt.encode(payload, key, algorithm=alg, headers={"kid": kid})
+
+
+def verify_token(token):
+    """Check signature and exp. Raises jwt.InvalidTokenError (or its ExpiredSignatureError)."""
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None:
+        if _keyring and not JWT_ACCEPT_HS256:
+            raise jwt.InvalidTokenError("token has no kid")
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+
+    found = _keyring.verification_key(kid) if _keyring else None
+    if not found:
+        raise jwt.InvalidTokenError(f"unknown kid '{kid}'")
+    key, alg = found
+    return jwt.decode(token, key, algorithms=[alg])
+
+
+def jwks():
+    """Public keys for the JWKS endpoint"""
+    return _keyring.jwks() if _keyring else {"keys": []}
+
+
+def create_jwt(user):
+    """
+    Generate a short-lived access token for a user. Its claims (role,
+    status, User id) are trusted until it expires, so requests need no
+    User lookup; /auth/refresh re-reads them.
+    """
+    payload = {
+        "typ": "access",
+        "uid": str(user.id),
+        "userId": user.userId,
+        "role": user.role,
+        "status": user.status,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(seconds=JWT_EXPIRY),
+        "iat": datetime.datetime.utcnow(),
+        "jti": uuid.uuid4().hex,  # lets /auth/logout revoke this token
+    }
+    return encode_token(payload)
+
+
+def decode_jwt(token):
+    """Decode and verify JWT"""
+    try:
+        claims = verify_token(token)
+    except jwt.ExpiredSignatureError:
+        return None  # expired
+    except jwt.InvalidTokenError:
+        return None  # invalid
+    if claims.get("typ", "access") != "access":
+        return None  # e.g. a password reset token
+    if is_revoked(claims.get("jti")):
+        return None  # revoked
+    return claims
@@ -1,5 +1,10 @@
 # utils/utils.py
+import re
 import uuid
+
+from mongoengine import NotUniqueError
+
+from models.counter import Counter
 from models.user import User
 
 ROLE_PREFIX = {
@@ -8,6 +13,9 @@ ROLE_PREFIX = {
     "admin": "ADM",
 }
 
+# Fresh ids tried before giving up on a generated userId
+ID_ATTEMPTS = 5
+
 def generate_user_id(role: str) -> str:
     """
     Generate userId using role prefix + short UUID.
@@ -18,6 +26,49 @@ def generate_user_id(role: str) -> str:
     unique_part = uuid.uuid4().hex[:8].upper()
     return f"{prefix}-{unique_part}"
 
+def allocate_user_ids(role: str, count: int) -> list:
+    """
+    Reserve `count` sequential userIds for `role` with one atomic $inc.
+    Example: STU-000000042. Nine digits, so they never match an id from
+    generate_user_id.
+    """
+    if count <= 0:
+        return []
+    counter = Counter.objects(name=f"userId:{role}").modify(upsert=True, new=True, inc__value=count)
+    prefix = ROLE_PREFIX.get(role, "USR")
+    return [f"{prefix}-{n:09d}" for n in range(counter.value - count + 1, counter.value + 1)]
+
+def duplicate_key_field(details) -> str:
+    """
+    Field of the unique index a duplicate key error hit, from its details
+    (or a bulk writeError), or None when the server doesn't say.
+    """
+    details = details or {}
+    if details.get("keyPattern"):
+        return next(iter(details["keyPattern"]))
+    match = re.search(r"index: (\w+?)_-?1\b", details.get("errmsg", ""))
+    return match.group(1) if match else None
+
+def insert_user(user, generated_id=True):
+    """
+    Insert a new User, letting the unique indexes on userId and email catch
+    clashes instead of checking first. A clash on a generated userId is
+    retried with a fresh one. Returns the taken field ("userId" or
+    "email"), or None once the user is saved.
+    """
+    for _ in range(ID_ATTEMPTS):
+        try:
+            user.save(force_insert=True)
+            return None
+        except NotUniqueError as e:
+            field = duplicate_key_field(getattr(e.__cause__ or e.__context__, "details", None))
+            if field is None:
+                field = "email" if user.email and email_in_use(user.email) else "userId"
+            if field != "userId" or not generated_id:
+                return field
+            user.userId = generate_user_id(user.role)
+    return "userId"
+
 def email_in_use(email: str) -> bool:
     return bool(User.objects(email=email).first())
 
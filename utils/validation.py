@@ -0,0 +1,100 @@
+# utils/validation.py
+"""
+Vectorized validation and type coercion for uploaded tables.
+
+A whole chunk is coerced column by column with pandas; invalid cells are
+flagged with boolean masks and turned into the `skipped` report in bulk,
+instead of calling int()/float() inside a try/except for every row.
+Chunks may hold CSV strings or already-typed columns from Parquet/Arrow.
+"""
+import numpy as np
+import pandas as pd
+
+TRUE_VALUES = ("true", "1")
+
+
+class Column:
+    """
+    One input column of an import.
+
+    kind is "int", "float", "bool" or "str". A column missing from the file
+    takes `default`; a present but blank numeric cell is invalid, a blank
+    string cell counts as missing. `field` is the document field name when
+    it differs from the column name.
+    """
+
+    def __init__(self, name, kind="str", default=None, field=None, choices=None, required=False):
+        self.name = name
+        self.kind = kind
+        self.default = default
+        self.field = field or name
+        self.choices = choices
+        self.required = required
+
+
+def _coerce(raw, column):
+    """Return (typed values, [(invalid mask, reason), ...]) for one present column"""
+    if column.kind in ("int", "float"):
+        values = pd.to_numeric(raw, errors="coerce")
+        invalid = values.isna()
+        if column.kind == "int":
+            invalid |= (values % 1) != 0
+        return values, [(invalid, "Invalid number format")]
+
+    if column.kind == "bool":
+        if pd.api.types.is_bool_dtype(raw) or pd.api.types.is_numeric_dtype(raw):
+            return raw.fillna(0).astype(bool), []
+        return raw.astype("string").str.strip().str.lower().isin(TRUE_VALUES).astype(bool), []
+
+    if not pd.api.types.is_string_dtype(raw):
+        raw = raw.astype("string")
+    values = raw.where(raw.str.len() > 0, None).astype(object)
+    values = values.where(values.notna(), None)
+    if column.default is not None:
+        values = values.fillna(column.default)
+    checks = []
+    if column.required:
+        checks.append((values.isna(), "Field is required"))
+    if column.choices:
+        checks.append((values.notna() & ~values.isin(column.choices), "Invalid value"))
+    return values, checks
+
+
+def validate_frame(frame, columns):
+    """
+    Coerce a DataFrame (CSV strings or typed columns) against `columns`.
+
+    Returns (typed, reasons): `typed` holds one typed column per Column
+    (named by field) for every input row; `reasons` is a Series of the first
+    validation failure per row, None for valid rows.
+    """
+    typed = pd.DataFrame(index=frame.index)
+    reasons = pd.Series(None, index=frame.index, dtype=object)
+
+    for column in columns:
+        if column.name not in frame.columns:
+            if column.required:
+                reasons = reasons.fillna(f"Field is required: {column.name}")
+            typed[column.field] = column.default
+            continue
+
+        raw = frame[column.name]
+        values, checks = _coerce(raw, column)
+        typed[column.field] = values
+        for invalid, reason in checks:
+            if invalid.any():
+                detail = f"{reason}: {column.name}=" + raw[invalid].map(repr)
+                reasons = reasons.where(reasons.notna() | ~invalid, detail)
+
+    return typed, reasons
+
+
+def to_documents(typed, columns):
+    """Turn validated typed columns into BSON-ready dicts, dropping empty fields"""
+    int_fields = [c.field for c in columns if c.kind == "int" and typed[c.field].notna().all()]
+    typed = typed.astype({field: np.int64 for field in int_fields})
+
+    return [
+        {k: v for k, v in record.items() if v is not None and v == v}
+        for record in typed.to_dict("records")
+    ]